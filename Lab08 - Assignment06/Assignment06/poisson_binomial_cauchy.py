@@ -0,0 +1,725 @@
+"""
+Plot Poisson rate posterior PDFs, and binomial alpha posterior PDFs, as
+a demo of the UnivariateBayesianInference class.
+
+Created Feb 27, 2015 by Tom Loredo
+"""
+
+from collections import deque
+
+from scipy import *
+from scipy import stats
+from scipy.special import xlogy, xlog1py, gammaln, betaln, gammaincc
+
+from univariate_bayes import UnivariateBayesianInference, GridPosteriors, \
+    auto_range, log_pdf
+
+
+__all__ = ['BinomialInference', 'PoissonRateInference',
+           'CauchyLocationInference', 'BinomialBatch', 'PoissonRateBatch',
+           'PoissonRateMonitor']
+
+
+class BinomialInference(UnivariateBayesianInference):
+    """
+    Bayesian inference for the probability of a Bernoulli outcome, based
+    on binomial data.
+    """
+
+    def __init__(self, n, n_trials, prior=1., na=200, arange=(0., 1.),
+                 tol=None, refine='local', conjugate=True):
+        """
+        Define a posterior PDF for the probability of a Bernoulli outcome,
+        alpha, based on binomail data.
+
+        Parameters
+        ----------
+
+        n : int
+            Number of successes
+
+        n_trials : int
+            Number of trials (>= n)
+
+        prior : const or function
+            Prior PDF for alpha, as a constant for flat prior, or
+            a function that can evaluate the PDF on an array
+
+        na : int
+            Number of alpha values on the grid
+
+        arange : 2-tuple of floats
+            Range of alpha spanned by the grid
+
+        tol, refine : float, str
+            If `tol` is given, the grid of `na` points is refined to this
+            tolerance, so `na` can be small; `refine` selects local
+            ('local') or whole-grid ('double') refinement (see the
+            UnivariateBayesianInference docs)
+
+        conjugate : bool
+            If True, and the prior is a frozen scipy.stats beta dist'n (or
+            a constant with arange=(0,1)), use the exact beta posterior
+            rather than evaluating the posterior on the grid; `tol` and
+            `refine` are then ignored
+        """
+        self.n, self.n_trials = n, n_trials
+        # Log of the combinatorial factor, n_trials choose n:
+        self.log_binom = _log_binom(n, n_trials)
+        self.na = na
+        self.alphas = linspace(arange[0], arange[1], na)
+
+        post = None
+        if conjugate:
+            post = self._beta_posterior(prior, arange)
+        if post is not None:
+            self._init_analytic(self.alphas, prior, *post, llfunc=self.llfunc)
+        else:
+            # Pass info to the base class initializer.
+            super(BinomialInference, self).__init__(self.alphas, prior,
+                                                    llfunc=self.llfunc,
+                                                    tol=tol, refine=refine)
+        self.alphas = self.param_grid
+
+    def _beta_posterior(self, prior, arange):
+        """
+        Return the beta posterior dist'n, log marginal likelihood, and
+        mode if `prior` is a conjugate (beta or flat) prior, else None.
+        """
+        if not callable(prior):
+            # A constant prior is conjugate only over the full range.
+            if tuple(arange) != (0., 1.) or prior <= 0.:
+                return None
+            a, b, log_c = 1., 1., log(prior)
+        else:
+            params = _frozen_params(prior, 'beta')
+            if params is None:
+                return None
+            (a, b), loc, scale = params
+            if loc != 0. or scale != 1.:
+                return None
+            log_c = -betaln(a, b)
+        a_post = a + self.n
+        b_post = b + self.n_trials - self.n
+        post_dist = stats.beta(a_post, b_post)
+        if not _covers(post_dist, arange):
+            return None
+        log_mlike = self.log_binom + log_c + betaln(a_post, b_post)
+        return post_dist, log_mlike, _beta_mode(a_post, b_post)
+
+    def llfunc(self, alphas):
+        """
+        Evaluate the Binomial log-likelihood function on a grid of alphas.
+
+        This is computed in log space (with 0*log(0) = 0 at the ends of the
+        alpha range), so it is accurate for arbitrarily large counts.
+        """
+        return _binom_log_like(self.n, self.n_trials, alphas, self.log_binom)
+
+    # Hooks for `update`; a datum is an (n, n_trials) pair.
+    _datum_shape = (2,)
+
+    def _data_items(self):
+        return array([[self.n, self.n_trials]], dtype=float)
+
+    def _data_log_like(self, items):
+        n, n_trials = items.sum(axis=0)
+        log_binom = _log_binom(items[:, 0], items[:, 1]).sum()
+        return _binom_log_like(n, n_trials, self.param_grid, log_binom)
+
+    def _add_data(self, items, sign=1):
+        n, n_trials = items.sum(axis=0)
+        self.n += sign*n
+        self.n_trials += sign*n_trials
+        self.log_binom += sign*_log_binom(items[:, 0], items[:, 1]).sum()
+
+    def _analytic_posterior(self):
+        return self._beta_posterior(self.prior,
+                                    (self.param_grid[0], self.param_grid[-1]))
+
+
+class PoissonRateInference(UnivariateBayesianInference):
+    """
+    Bayesian inference for a Poisson rate.
+    """
+
+    def __init__(self, intvl, n, prior, r_u=None, r_l=0, nr=200,
+                 log_grid=False, tol=None, refine='local', conjugate=True):
+        """
+        Define a posterior PDF for a Poisson rate.
+
+        Parameters
+        ----------
+        intvl : float
+            Interval for observations
+
+        n : int
+            Counts observed
+
+        prior : const or function
+            Prior PDF for the rate, as a constant for flat prior, or
+            a function that can evaluate the PDF on an array
+
+        r_u : float
+            Upper limit on rate for evaluating the PDF; if None, the grid
+            limits are found automatically to span the posterior (from the
+            analytic posterior for a conjugate prior, and otherwise by
+            `auto_range`), with `r_l` serving as a hard lower limit
+
+        r_l : float
+            Lower limit on rate for evaluating the PDF
+
+        nr : int
+            Number of rate values on the grid
+
+        log_grid : bool
+            If True, space the rate grid logarithmically between `r_l` and
+            `r_u` (requires r_l > 0); useful when the posterior may span
+            several decades
+
+        tol, refine : float, str
+            If `tol` is given, the grid of `nr` points is refined to this
+            tolerance, so `nr` can be small; `refine` selects local
+            ('local') or whole-grid ('double') refinement (see the
+            UnivariateBayesianInference docs)
+
+        conjugate : bool
+            If True, and the prior is a frozen scipy.stats gamma dist'n
+            (with loc=0), use the exact gamma posterior rather than
+            evaluating the posterior on the grid; `tol` and `refine` are
+            then ignored
+        """
+        self.intvl = intvl
+        self.n = n
+        # Parts of the log likelihood independent of the rate:
+        self.log_const = _poisson_log_const(intvl, n)
+        post = None
+        if conjugate and r_u is None:
+            # Span the analytic posterior, if there is one, out to where
+            # the grid truncation is negligible on both sides.
+            self.r_l, self.r_u = r_l, inf
+            post = self._gamma_posterior(prior)
+            if post is not None:
+                r_l = max([r_l, post[0].ppf(1e-12)])
+                r_u = post[0].isf(1e-12)
+        if r_u is None:
+            log_post = lambda r: _log_prior_grid(prior, r) + self.llfunc(r)
+            r_l, r_u, r_mode, r_sig = auto_range(log_post, n/intvl,
+                                                 sqrt(max([n, 1.]))/intvl,
+                                                 bounds=(r_l, inf))
+        self.r_l, self.r_u = r_l, r_u
+        self.nr = nr
+        if log_grid:
+            if r_l <= 0.:
+                raise ValueError('Log-spaced grid requires r_l > 0!')
+            self.rvals = logspace(log10(r_l), log10(r_u), nr)
+        else:
+            self.rvals = linspace(r_l, r_u, nr)
+
+        if conjugate and post is None:
+            post = self._gamma_posterior(prior)
+        if post is not None:
+            self._init_analytic(self.rvals, prior, *post, llfunc=self.llfunc)
+        else:
+            # Pass info to the base class initializer.
+            super(PoissonRateInference, self).__init__(self.rvals, prior,
+                                                       llfunc=self.llfunc,
+                                                       tol=tol, refine=refine)
+        self.rvals = self.param_grid
+
+    def _gamma_posterior(self, prior):
+        """
+        Return the gamma posterior dist'n, log marginal likelihood, and
+        mode if `prior` is a conjugate (gamma) prior, else None.
+        """
+        params = _frozen_params(prior, 'gamma')
+        if params is None:
+            return None
+        (a,), loc, scale = params
+        if loc != 0.:
+            return None
+        a_post = a + self.n
+        scale_post = 1./(1./scale + self.intvl)
+        post_dist = stats.gamma(a_post, scale=scale_post)
+        if not _covers(post_dist, (self.r_l, self.r_u)):
+            return None
+        log_mlike = self.log_const + gammaln(a_post) - gammaln(a) \
+            + a_post*log(scale_post) - a*log(scale)
+        mode = max([a_post - 1., 0.])*scale_post
+        return post_dist, log_mlike, mode
+
+    def llfunc(self, rvals):
+        """
+        Evaluate the Poisson log-likelihood function on a grid of rates.
+
+        This is computed in log space (with 0*log(0) = 0 for r = 0), so it
+        is accurate for arbitrarily large counts.
+        """
+        return _poisson_log_like(self.intvl, self.n, rvals, self.log_const)
+
+    # Hooks for `update`; a datum is an (intvl, n) pair.
+    _datum_shape = (2,)
+
+    def _data_items(self):
+        return array([[self.intvl, self.n]], dtype=float)
+
+    def _data_log_like(self, items):
+        intvl, n = items.sum(axis=0)
+        log_const = _poisson_log_const(items[:, 0], items[:, 1]).sum()
+        return _poisson_log_like(intvl, n, self.param_grid, log_const)
+
+    def _add_data(self, items, sign=1):
+        intvl, n = items.sum(axis=0)
+        self.intvl += sign*intvl
+        self.n += sign*n
+        self.log_const += sign*_poisson_log_const(items[:, 0],
+                                                  items[:, 1]).sum()
+
+    def _analytic_posterior(self):
+        return self._gamma_posterior(self.prior)
+
+
+class CauchyLocationInference(UnivariateBayesianInference):
+    """
+    Bayesian inference for the location parameter of the Cauchy dist'n.
+    """
+
+    def __init__(self, scale, data, prior, x0_range=None, n=250, tol=None,
+                 refine='local', chunk_bytes=2**26):
+        """
+        Define a posterior PDF for the location parameter, x0, of a
+        Cauchy dist'n.
+
+        Parameters
+        ----------
+        scale : float
+            Cauchy scale parameter (presumed known)
+
+        data : float array
+            Vector of samples modeled as from a Cauchy dist'n
+
+        prior : const or function
+            Prior PDF for the location, as a constant for flat prior, or
+            a function that can evaluate the prior PDF on an array
+
+        x0_range : 2-tuple of floats, None, or 'auto'
+            Range of x0 defining the grid over which the posterior PDF will
+            be evaluated; if None, the range of the data is used; if 'auto',
+            the range is found automatically to span the posterior (see
+            `auto_range`), starting from the data median
+
+        n : int
+            Number of x0 values on the grid; with x0_range='auto', it is
+            raised if needed (up to 100000) to make the spacing at most a
+            quarter of the width of the posterior peak
+
+        tol, refine : float, str
+            If `tol` is given, the grid of `n` points is refined to this
+            tolerance, so `n` can be small; `refine` selects local
+            ('local') or whole-grid ('double') refinement (see the
+            UnivariateBayesianInference docs)
+
+        chunk_bytes : int
+            Memory budget for the temporary (x0 x data) arrays used to
+            evaluate the log-likelihood; the data are processed in chunks
+            sized to fit (default 64 MB)
+        """
+        self.scale = scale
+        self.scale2 = scale*scale
+        self.data = asarray(data, dtype=float)
+        self.chunk_bytes = chunk_bytes
+        if x0_range is None:
+            self.x0_l = data.min()
+            self.x0_u = data.max()
+        elif isinstance(x0_range, str) and x0_range == 'auto':
+            log_post = lambda x0: _log_prior_grid(prior, x0) + self.llfunc(x0)
+            self.x0_l, self.x0_u, x0_mode, sig = auto_range(
+                log_post, median(self.data), scale)
+            # The posterior's power-law tails can make the range wide
+            # compared to the peak, so keep the spacing below sig/4.
+            n_min = int(ceil(4.*(self.x0_u - self.x0_l)/sig)) + 1
+            n = max([n, min([n_min, 100000])])
+        else:
+            self.x0_l, self.x0_u = x0_range
+        self.n = n
+        self.x0_grid = linspace(self.x0_l, self.x0_u, n)
+
+        # Pass info to the base class initializer.
+        super(CauchyLocationInference, self).__init__(self.x0_grid, prior,
+                                                      llfunc=self.llfunc,
+                                                      tol=tol, refine=refine)
+        self.x0_grid = self.param_grid
+
+    def llfunc(self, x0vals, data=None):
+        """
+        Evaluate the Cauchy log-likelihood function for x0vals (scalar or
+        vector), for `data` (default: the stored data).
+
+        The sum of log terms over the data is accumulated chunk by chunk,
+        with each chunk handled for all x0vals at once; chunks are sized so
+        the (x0 x chunk) temporary stays within `chunk_bytes`.
+        """
+        if data is None:
+            data = self.data
+        x0vals = asarray(x0vals, dtype=float)  # gives scalars .shape
+        x0s = x0vals.reshape(-1, 1)
+        llvals = zeros(len(x0s))
+        n_chunk = int(self.chunk_bytes//(8*len(x0s))) or 1
+        for i in range(0, len(data), n_chunk):
+            chunk = data[i:i+n_chunk]
+            llvals -= log1p((x0s - chunk)**2/self.scale2).sum(axis=1)
+        return llvals.reshape(x0vals.shape)  # scalar argument -> scalar result
+
+    # Hooks for `update`; a datum is a single sample.
+    def _data_items(self):
+        return self.data
+
+    def _data_log_like(self, items):
+        return self.llfunc(self.param_grid, items)
+
+    def _add_data(self, items, sign=1):
+        if sign > 0:
+            self.data = concatenate((self.data, items))
+        else:  # drop the oldest samples
+            self.data = self.data[len(items):]
+
+
+def _log_binom(n, n_trials):
+    """
+    Return the log of the binomial coefficient, n_trials choose n.
+    """
+    return -log1p(n_trials) - betaln(n + 1., n_trials - n + 1.)
+
+
+def _binom_log_like(n, n_trials, alphas, log_binom):
+    """
+    Return the binomial log likelihood for `n` successes in `n_trials`
+    trials, for success probabilities `alphas`, given the log binomial
+    coefficient `log_binom` (see `_log_binom`).  Computed in log space, with
+    0*log(0) = 0 at the ends of the alpha range; the arguments broadcast.
+    """
+    return xlogy(n, alphas) + xlog1py(n_trials - n, -alphas) + log_binom
+
+
+def _poisson_log_const(intvl, n):
+    """
+    Return the part of the Poisson log likelihood for `n` counts in an
+    interval `intvl` that is independent of the rate.
+    """
+    return xlogy(n, intvl) - gammaln(n + 1.)
+
+
+def _poisson_log_like(intvl, n, rvals, log_const):
+    """
+    Return the Poisson log likelihood for `n` counts in an interval `intvl`,
+    for rates `rvals`, given the rate-independent part `log_const` (see
+    `_poisson_log_const`).  Computed in log space, with 0*log(0) = 0 for
+    r = 0; the arguments broadcast.
+    """
+    return xlogy(n, rvals) - intvl*rvals + log_const
+
+
+def _frozen_params(prior, name):
+    """
+    If `prior` is the `pdf` method of a frozen scipy.stats dist'n named
+    `name`, return its (shape params, loc, scale); otherwise return None.
+    """
+    frozen = getattr(prior, '__self__', None)
+    dist = getattr(frozen, 'dist', None)
+    if getattr(prior, '__name__', None) != 'pdf' or \
+            getattr(dist, 'name', None) != name:
+        return None
+    # Match the frozen args and kwds to the shape names, loc, and scale.
+    names = (dist.shapes.split(', ') if dist.shapes else []) + \
+        ['loc', 'scale']
+    vals = dict(zip(names, frozen.args))
+    vals.update(frozen.kwds)
+    shapes = tuple(vals[name] for name in names[:-2])
+    return shapes, vals.get('loc', 0.), vals.get('scale', 1.)
+
+
+def _covers(post_dist, prange, tol=1e-9):
+    """
+    Return True if the range `prange` includes all but a fraction `tol` of
+    the probability in `post_dist`; otherwise the truncation by the grid
+    matters, and the posterior must be computed on the grid.
+    """
+    mass = post_dist.cdf(prange[1]) - post_dist.cdf(prange[0])
+    return mass >= 1. - tol
+
+
+def _beta_mode(a, b):
+    """
+    Return the mode of the beta(a, b) dist'n (choosing the midpoint for
+    a = b = 1, and the higher endpoint for other U-shaped cases).
+    """
+    if a > 1. and b > 1.:
+        return (a - 1.)/(a + b - 2.)
+    elif a == b == 1.:
+        return 0.5
+    elif a <= 1. and b > 1.:
+        return 0.
+    elif a > 1. and b <= 1.:
+        return 1.
+    else:
+        return 0. if a < b else 1.
+
+
+def _log_prior_grid(prior, grid):
+    """
+    Evaluate the log of `prior` (a constant, or a function that can evaluate
+    the PDF on an array) on a grid.
+    """
+    if callable(prior):
+        return log_pdf(prior, grid)
+    with errstate(divide='ignore'):
+        return log(prior)*ones_like(grid)
+
+
+class BinomialBatch(GridPosteriors):
+    """
+    Bayesian inference for the Bernoulli outcome probabilities of many
+    binomial datasets at once, all evaluated on a common grid of alphas.
+    """
+
+    def __init__(self, ns, n_trials, prior=1., na=200, arange=(0., 1.)):
+        """
+        Define posterior PDFs for the probabilities of Bernoulli outcomes,
+        alpha, based on a collection of binomial datasets.
+
+        Parameters
+        ----------
+        ns : int array
+            Numbers of successes, one per dataset
+
+        n_trials : int or int array
+            Numbers of trials (>= ns)
+
+        prior : const or function
+            Prior PDF for alpha, as a constant for flat prior, or
+            a function that can evaluate the PDF on an array
+
+        na : int
+            Number of alpha values on the grid
+
+        arange : 2-tuple of floats
+            Range of alpha spanned by the grid
+        """
+        self.ns = asarray(ns, dtype=float)
+        self.n_trials = asarray(n_trials, dtype=float)*ones_like(self.ns)
+        self.na = na
+        self.alphas = linspace(arange[0], arange[1], na)
+
+        # (datasets x grid) log likelihood:
+        ns, n_trials = self.ns[:, newaxis], self.n_trials[:, newaxis]
+        log_like = _binom_log_like(ns, n_trials, self.alphas,
+                                   _log_binom(ns, n_trials))
+        log_prior = _log_prior_grid(prior, self.alphas)
+        super(BinomialBatch, self).__init__(self.alphas, log_prior + log_like)
+
+
+class PoissonRateBatch(GridPosteriors):
+    """
+    Bayesian inference for the Poisson rates of many datasets (e.g., event
+    counters) at once.
+    """
+
+    def __init__(self, intvls, ns, prior, r_u, r_l=0., nr=200):
+        """
+        Define posterior PDFs for the Poisson rates of a collection of
+        counting datasets.
+
+        Parameters
+        ----------
+        intvls : float or float array
+            Intervals for observations, one per dataset (or a common value)
+
+        ns : int array
+            Counts observed, one per dataset
+
+        prior : const or function
+            Prior PDF for the rate, as a constant for flat prior, or
+            a function that can evaluate the PDF on an array
+
+        r_u, r_l : float or float array
+            Upper and lower limits on rate for evaluating the PDF; if either
+            is an array (one value per dataset), each dataset gets its own
+            rate grid
+
+        nr : int
+            Number of rate values on the grid(s)
+        """
+        self.ns = asarray(ns, dtype=float)
+        self.intvls = asarray(intvls, dtype=float)*ones_like(self.ns)
+        self.r_l, self.r_u = r_l, r_u
+        self.nr = nr
+        if isscalar(r_l) and isscalar(r_u):
+            self.rvals = linspace(r_l, r_u, nr)
+        else:
+            r_l = r_l*ones_like(self.ns)
+            r_u = r_u*ones_like(self.ns)
+            self.rvals = linspace(r_l, r_u, nr, axis=-1)
+
+        # (datasets x grid) log likelihood:
+        intvls, ns = self.intvls[:, newaxis], self.ns[:, newaxis]
+        log_like = _poisson_log_like(intvls, ns, self.rvals,
+                                     _poisson_log_const(intvls, ns))
+        log_prior = _log_prior_grid(prior, self.rvals)
+        super(PoissonRateBatch, self).__init__(self.rvals, log_prior + log_like)
+
+
+class PoissonRateMonitor(object):
+    """
+    Streaming monitor of a Poisson event rate over a sliding time window,
+    using the conjugate gamma posterior for the rate, and alerting when the
+    posterior probability that the rate exceeds a baseline is high.
+
+    Each event costs O(1) amortized work: event times are kept in a queue,
+    with expired events dropped from its front, and the posterior depends
+    on the data only via the event count and the exposure time.
+    """
+
+    def __init__(self, window, baseline, prior, threshold=0.99, reset=None,
+                 t0=0., callback=None):
+        """
+        Set up the monitor.
+
+        Parameters
+        ----------
+        window : float
+            Duration of the sliding window
+
+        baseline : float
+            Baseline rate
+
+        prior : function
+            Prior PDF for the rate; must be the `pdf` method of a frozen
+            scipy.stats gamma dist'n, with loc=0 (e.g.,
+            stats.gamma(a, scale=s).pdf)
+
+        threshold : float
+            An alert is raised when the probability that the rate exceeds
+            the baseline rises above this level
+
+        reset : float
+            After an alert, another alert is raised only after the
+            probability has fallen below this level (default: `threshold`);
+            a lower level keeps fluctuations near the threshold from
+            raising repeated alerts
+
+        t0 : float
+            Time at which monitoring starts
+
+        callback : function
+            If given, called as callback(t, prob) for each alert
+        """
+        params = _frozen_params(prior, 'gamma')
+        if params is None or params[1] != 0.:
+            raise ValueError('Prior must be a frozen gamma dist\'n pdf!')
+        (self.a,), loc, self.scale = params
+        self.prior = prior
+        self.window = window
+        self.baseline = baseline
+        self.threshold = threshold
+        self.reset = threshold if reset is None else reset
+        self.t0 = t0
+        self.callback = callback
+        self.times = deque()  # event times in the window
+        self.t = t0  # current time
+        self.alarm = False
+        self.alerts = []  # (time, probability) for each alert
+
+    @property
+    def n(self):
+        """
+        Number of events in the current window.
+        """
+        return len(self.times)
+
+    @property
+    def exposure(self):
+        """
+        Duration of the current window (shorter than `window` at the start).
+        """
+        return min([self.window, self.t - self.t0])
+
+    def gamma_params(self):
+        """
+        Return the shape and scale of the gamma posterior for the rate in
+        the current window.
+        """
+        return self.a + self.n, 1./(1./self.scale + self.exposure)
+
+    def rate_mean(self):
+        """
+        Return the posterior mean rate for the current window.
+        """
+        shape, scale = self.gamma_params()
+        return shape*scale
+
+    def prob_exceed(self):
+        """
+        Return the posterior probability that the rate in the current window
+        exceeds the baseline.
+        """
+        shape, scale = self.gamma_params()
+        return gammaincc(shape, self.baseline/scale)
+
+    def advance(self, t):
+        """
+        Advance the current time to `t` (without an event), dropping events
+        that have left the window, and check for an alert.  Returns the
+        probability that the rate exceeds the baseline.
+        """
+        if t < self.t:
+            raise ValueError('Times must be nondecreasing!')
+        self.t = t
+        start = t - self.window
+        times = self.times
+        while times and times[0] <= start:
+            times.popleft()
+        return self._check(t)
+
+    def event(self, t):
+        """
+        Record an event at time `t`, and check for an alert.  Returns the
+        probability that the rate exceeds the baseline.
+        """
+        if t < self.t:
+            raise ValueError('Times must be nondecreasing!')
+        self.times.append(t)
+        return self.advance(t)
+
+    def events(self, times):
+        """
+        Record a sequence of events at the (nondecreasing) `times`; returns
+        an array of the exceedance probabilities after each event.
+        """
+        return array([self.event(t) for t in times])
+
+    def _check(self, t):
+        """
+        Update the alarm state, recording an alert (and calling the callback)
+        on entering the alarm state.
+        """
+        prob = self.prob_exceed()
+        if prob > self.threshold:
+            if not self.alarm:
+                self.alarm = True
+                self.alerts.append((t, prob))
+                if self.callback is not None:
+                    self.callback(t, prob)
+        elif prob < self.reset:
+            self.alarm = False
+        return prob
+
+    def posterior(self, r_u=None, nr=200, conjugate=True):
+        """
+        Return a PoissonRateInference instance for the current window; the
+        posterior is the analytic gamma posterior if `conjugate` is True
+        (and the grid spans it), and a grid posterior otherwise.
+        """
+        if self.exposure <= 0.:
+            raise ValueError('No exposure yet; advance time past t0!')
+        return PoissonRateInference(self.exposure, self.n, self.prior, r_u,
+                                    nr=nr, conjugate=conjugate)
@@ -4,14 +4,30 @@ A class for exploring the behavior of 2-state Markov chains.
 Created Mar 20, 2015 by Tom Loredo
 """
 
+from functools import partial
+
 from matplotlib.pyplot import *
 from scipy import *
 from scipy import stats
+import numpy as np
 
 
 __all__ = ['TwoStateMarkovChain']
 
 
+def get_rng(rng=None):
+    """
+    Return a random number generator for a sampler: NumPy's global generator
+    if `rng` is None, a new numpy.random.Generator if `rng` is a seed (an
+    int or a SeedSequence), and `rng` itself otherwise (e.g., a Generator).
+    """
+    if rng is None:
+        return np.random
+    if isinstance(rng, (int, np.integer, np.random.SeedSequence)):
+        return np.random.default_rng(rng)
+    return rng
+
+
 def sig_alpha(n, ntot):
     """
     Posterior standard deviation for a binomial probability inferred from
@@ -25,7 +41,7 @@ class TwoStateMarkovChain:
     A class for exploring the behavior of a 2-state Markov chain.
     """
 
-    def __init__(self, alpha, beta, states=(0, 1), l=None):
+    def __init__(self, alpha, beta, states=(0, 1), l=None, rng=None):
         """
         Define a 2-state Markov chain from its state-change probabilities.
 
@@ -45,6 +61,10 @@ class TwoStateMarkovChain:
         l : int
             Length of simulated sample paths; can also be separately set or
             changed with path_length().
+
+        rng : numpy.random.Generator or int
+            Random number generator for the transitions (or a seed for a
+            new one); if None, NumPy's global generator is used.
         """
         self.alpha = alpha
         self.beta = beta
@@ -61,8 +81,12 @@ class TwoStateMarkovChain:
 
         # Transition samplers from states 0, 1; note that the binom param is
         # the "success" (state=1) probability:
-        self.samplers = [stats.binom(1, self.trans[1,0]).rvs,
-                         stats.binom(1, self.trans[1,1]).rvs]
+        rng = get_rng(rng)
+        self.rng = rng
+        self.samplers = [partial(stats.binom(1, self.trans[1,0]).rvs,
+                                 random_state=rng),
+                         partial(stats.binom(1, self.trans[1,1]).rvs,
+                                 random_state=rng)]
 
         # Equillibrium dist'n:
         self.p0_eq = beta/(alpha + beta)
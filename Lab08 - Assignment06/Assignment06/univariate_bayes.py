@@ -5,9 +5,13 @@ univariate model, using quadrature for integration.
 Created Feb 27, 2015 by Tom Loredo
 """
 
+import time
+from collections import OrderedDict, deque
+
 import numpy as np
 from scipy import *
 from scipy.optimize import minimize_scalar
+from scipy.interpolate import PchipInterpolator
 from matplotlib.pyplot import plot
 
 
@@ -18,13 +22,572 @@ from matplotlib.pyplot import plot
 rt2pi = sqrt(2*pi)
 
 
+def get_rng(rng=None):
+    """
+    Return a random number generator for a sampler: NumPy's global generator
+    if `rng` is None, a new numpy.random.Generator if `rng` is a seed (an
+    int or a SeedSequence), and `rng` itself otherwise (e.g., a Generator).
+    """
+    if rng is None:
+        return np.random
+    if isinstance(rng, (int, np.integer, np.random.SeedSequence)):
+        return np.random.default_rng(rng)
+    return rng
+
+
+def spawn_rngs(n, seed=None):
+    """
+    Return a list of `n` statistically independent numpy.random.Generator
+    instances, e.g., one per parallel worker, spawned from a SeedSequence
+    so their streams do not overlap.  Passing the same `seed` (an int or
+    a SeedSequence) reproduces the same streams; if it is None, fresh
+    entropy is used.
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return [np.random.default_rng(child) for child in seed.spawn(n)]
+
+
+def log_pdf(pdf, vals):
+    """
+    Return log(pdf(vals)) for a PDF function; when `pdf` is the `pdf` method
+    of a frozen scipy.stats dist'n, its `logpdf` method is used instead, so
+    the log PDF stays finite far in the tails, where the PDF underflows.
+    """
+    frozen = getattr(pdf, '__self__', None)
+    if getattr(pdf, '__name__', None) == 'pdf' and \
+            hasattr(frozen, 'logpdf'):
+        return frozen.logpdf(vals)
+    with np.errstate(divide='ignore'):  # log(0) -> -inf is OK here
+        return log(pdf(vals))
+
+
+def uniforms(n, rng, method='random'):
+    """
+    Return `n` variates uniform on [0, 1), for inverse CDF sampling.
+
+    Parameters
+    ----------
+    n : int
+        Number of variates
+
+    rng : random number generator
+        Object whose `random(size)` method returns uniform variates (see
+        `get_rng`)
+
+    method : str
+        'random' for independent variates; 'stratified' for one variate
+        in each of `n` equal strata of [0, 1), in random order;
+        'antithetic' for independent variates u in pairs with 1-u; or
+        'sobol' for a scrambled Sobol (quasi-random) sequence, which is
+        best balanced when `n` is a power of 2
+    """
+    if method == 'random':
+        return rng.random(n)
+    elif method == 'stratified':
+        return rng.permutation((arange(n) + rng.random(n))/n)
+    elif method == 'antithetic':
+        u = rng.random((n + 1)//2)
+        return concatenate((u, 1. - u))[:n]
+    elif method == 'sobol':
+        from scipy.stats import qmc  # requires scipy >= 1.7
+        # Seed the scramble from `rng`, so seeding the global generator (or
+        # a RandomState) reproduces the draws too.
+        if isinstance(rng, np.random.Generator):
+            seed = rng
+        else:
+            seed = int(rng.random(1)[0]*np.iinfo(np.int32).max)
+        sobol = qmc.Sobol(1, scramble=True, seed=seed)
+        return sobol.random(n)[:, 0]
+    else:
+        raise ValueError('Invalid sampling method!')
+
+
+def trapz_pass(x, fvals, x_ref=0.):
+    """
+    Integrate `fvals` over the grid `x` with the trapezoid rule, in a single
+    vectorized pass that also yields the mean and variance of `x` weighted
+    by `fvals`, and the cumulative integral.
+
+    Parameters
+    ----------
+    x : float array
+        Grid of abscissas, in increasing order (need not be equally spaced);
+        with 2-D `fvals`, this may also be 2-D, giving a grid for each row
+
+    fvals : float array
+        Nonnegative integrand values on the grid; a 2-D array of shape
+        (K, len(x)) specifies K integrands, all handled at once
+
+    x_ref : float or float array
+        Reference point for the moment sums (one per integrand); using a
+        point near the peak of `fvals` reduces roundoff in the variance
+
+    Returns
+    -------
+    norm, mean, var : floats (or length-K arrays)
+        The integral of `fvals`, and the mean and variance of `x`
+
+    cum : float array
+        The cumulative integral of `fvals`, starting from 0 at x[0]
+    """
+    # Stack the integrands f, (x-x_ref)*f, (x-x_ref)**2*f, and sum their
+    # trapezoids cumulatively, all at once.
+    u = (x - asarray(x_ref)[..., newaxis])[..., newaxis, :]
+    integrands = fvals[..., newaxis, :] * u**arange(3)[:, newaxis]
+    dx = diff(x)[..., newaxis, :]
+    traps = 0.5*dx*(integrands[..., :-1] + integrands[..., 1:])
+    cum = zeros_like(integrands)
+    np.cumsum(traps, axis=-1, out=cum[..., 1:])
+    norm = cum[..., 0, -1]
+    mean_u = cum[..., 1, -1]/norm
+    var = cum[..., 2, -1]/norm - mean_u**2
+    return norm, x_ref + mean_u, var, cum[..., 0, :]
+
+
+def trapz_weights(x):
+    """
+    Return the weights w for which sum(w*f) is the trapezoid-rule integral
+    of f over the (increasing, possibly non-uniform) grid x.
+    """
+    dx = diff(x)
+    w = zeros(len(x))
+    w[:-1] += 0.5*dx
+    w[1:] += 0.5*dx
+    return w
+
+
+def refine_grid(log_func, grid, log_vals, tol, max_pts=100000):
+    """
+    Adaptively refine a grid for trapezoid-rule integration of a function
+    specified by its log, exp(log_func(x)).
+
+    Each interval is tested by evaluating the function at its midpoint and
+    comparing the 1- and 2-panel trapezoid rules; intervals whose estimated
+    error exceeds `tol` times the current integral estimate are split, and
+    their halves are tested in the next round.  Midpoints are kept whether
+    or not an interval needs further refinement, so no function evaluation
+    is wasted.  All new midpoints in a round are evaluated in a single call
+    of `log_func`.
+
+    Features narrower than the spacing of the starting grid may be missed,
+    so the starting grid should be fine enough to locate all significant
+    peaks.
+
+    Parameters
+    ----------
+    log_func : function
+        Function evaluating the log of the integrand on an array
+
+    grid : float array
+        Starting grid, in increasing order
+
+    log_vals : float array
+        Values of `log_func` on the starting grid
+
+    tol : float
+        Tolerance for the trapezoid error in each interval, relative to the
+        integral over the whole grid
+
+    max_pts : int
+        Maximum size of the refined grid; refinement stops (without
+        warning) when this is reached, with the final round inserting
+        midpoints only in the intervals with the largest estimated errors
+
+    Returns
+    -------
+    grid, log_vals : float arrays
+        The refined grid, and the log integrand on it
+    """
+    grid = asarray(grid, dtype=float)
+    log_vals = asarray(log_vals, dtype=float)
+    active = ones(len(grid)-1, dtype=bool)  # intervals to be tested
+    while active.any() and len(grid) < max_pts:
+        lo = flatnonzero(active)
+        mids = 0.5*(grid[lo] + grid[lo+1])
+        log_mids = log_func(mids)
+
+        # Scale integrand values by the current max, to avoid overflow.
+        log_max = max([log_vals.max(), log_mids.max()])
+        f_lo = exp(log_vals[lo] - log_max)
+        f_hi = exp(log_vals[lo+1] - log_max)
+        f_mid = exp(log_mids - log_max)
+        total = np.trapz(exp(log_vals - log_max), grid)
+
+        # Richardson estimate of the 2-panel error:  (T1 - T2)/3, where
+        # T1 - T2 = h*(f_lo + f_hi - 2*f_mid)/4 for an interval of size h.
+        h = grid[lo+1] - grid[lo]
+        err = abs(f_lo + f_hi - 2.*f_mid)*h/12.
+
+        # If the midpoints will not all fit, keep those of the intervals
+        # with the largest errors; this is the last round.
+        room = max_pts - len(grid)
+        if len(lo) > room:
+            keep = np.sort(np.argsort(err)[::-1][:room])
+            active[:] = False
+            active[lo[keep]] = True
+            lo, mids, log_mids, err = lo[keep], mids[keep], log_mids[keep], \
+                err[keep]
+        split = zeros_like(active)
+        split[lo] = err > tol*total
+
+        # Insert the midpoints; the halves of split intervals are tested in
+        # the next round.
+        grid = np.insert(grid, lo+1, mids)
+        log_vals = np.insert(log_vals, lo+1, log_mids)
+        active = np.repeat(split, where(active, 2, 1))
+    return grid, log_vals
+
+
+def double_grid(log_func, grid, log_vals, tol, max_pts=100000):
+    """
+    Refine a grid by repeated doubling (halving every interval) until the
+    trapezoid-rule integral of exp(log_func(x)), and the mean and standard
+    deviation of x weighted by it, converge.
+
+    As in Romberg integration, each doubling evaluates the function only at
+    the new midpoints, reusing all previous values, and the trapezoid
+    results from successive grids are combined by Richardson extrapolation
+    (T_2h + (T_2h - T_h)/3) to cancel the leading O(h**2) error term.
+    Convergence is declared when successive extrapolated estimates of the
+    log integral, and of the mean and std devn (in units of the std devn),
+    change by less than `tol`.
+
+    Parameters
+    ----------
+    log_func : function
+        Function evaluating the log of the integrand on an array
+
+    grid : float array
+        Starting grid, in increasing order
+
+    log_vals : float array
+        Values of `log_func` on the starting grid
+
+    tol : float
+        Convergence tolerance (see above)
+
+    max_pts : int
+        Maximum size of the refined grid; doubling stops (without warning)
+        when another doubling would exceed this
+
+    Returns
+    -------
+    grid, log_vals : float arrays
+        The refined grid, and the log integrand on it
+
+    log_norm, mean, std : floats
+        The extrapolated log integral, mean, and std devn
+    """
+    grid = asarray(grid, dtype=float)
+    log_vals = asarray(log_vals, dtype=float)
+    x_ref = grid[log_vals.argmax()]
+    log_shift = log_vals.max()
+
+    def integrals(grid, log_vals):
+        """
+        Trapezoid integrals of f, (x-x_ref)*f, and (x-x_ref)**2*f, with
+        f = exp(log_vals - log_shift).
+        """
+        norm, mean, var, cum = trapz_pass(grid, exp(log_vals - log_shift),
+                                          x_ref)
+        u = mean - x_ref
+        return array([norm, norm*u, norm*(var + u**2)])
+
+    def summaries(ints):
+        """
+        Log integral, mean, and std devn from the `integrals` values.
+        """
+        u = ints[1]/ints[0]
+        return array([log_shift + log(ints[0]), x_ref + u,
+                      sqrt(ints[2]/ints[0] - u**2)])
+
+    old = integrals(grid, log_vals)
+    prev = None
+    while 2*len(grid) - 1 <= max_pts:
+        # Evaluate only the new midpoints, and interleave them.
+        log_mids = log_func(0.5*(grid[:-1] + grid[1:]))
+        new_grid = empty(2*len(grid) - 1)
+        new_grid[::2] = grid
+        new_grid[1::2] = 0.5*(grid[:-1] + grid[1:])
+        new_vals = empty_like(new_grid)
+        new_vals[::2] = log_vals
+        new_vals[1::2] = log_mids
+        grid, log_vals = new_grid, new_vals
+
+        # Keep the scaling of the integrand fixed unless it would overflow.
+        if log_mids.max() > log_shift:
+            old *= exp(log_shift - log_mids.max())
+            log_shift = log_mids.max()
+        new = integrals(grid, log_vals)
+        rich = summaries(new + (new - old)/3.)
+        old = new
+        if prev is not None:
+            change = abs(rich - prev)
+            change[1:] /= rich[2]
+            if (change < tol).all():
+                break
+        prev = rich
+    else:
+        rich = prev if prev is not None else summaries(old)
+    return grid, log_vals, rich
+
+
+def golden_max(log_func, a, c, xatol=1e-6):
+    """
+    Maximize a function over many brackets at once, by golden section
+    search; each step evaluates `log_func` on an array with one point per
+    bracket.  The function should be unimodal in each bracket.
+
+    Parameters
+    ----------
+    log_func : function
+        Function that can evaluate on an array
+
+    a, c : float arrays
+        Lower and upper ends of the brackets
+
+    xatol : float
+        Tolerance for the locations of the maxima, as a fraction of the
+        bracket widths
+
+    Returns
+    -------
+    x, f : float arrays
+        The locations of the maxima, and the function values there
+    """
+    r = 0.5*(sqrt(5.) - 1.)  # golden section ratio
+    a, c = asarray(a, dtype=float), asarray(c, dtype=float)
+    b, d = c - r*(c - a), a + r*(c - a)
+    fb, fd = log_func(b), log_func(d)
+    # All brackets shrink by the same factor, r, per step.
+    n_steps = int(ceil(log(xatol)/log(r)))
+    for i in range(n_steps):
+        left = fb >= fd  # max is in [a, d]
+        a, c = where(left, a, b), where(left, d, c)
+        x_new = where(left, c - r*(c - a), a + r*(c - a))
+        f_new = log_func(x_new)
+        b, fb, d, fd = (where(left, x_new, d), where(left, f_new, fd),
+                        where(left, b, x_new), where(left, fb, f_new))
+    left = fb >= fd
+    return where(left, b, d), where(left, fb, fd)
+
+
+def auto_range(log_func, x0, scale, bounds=(-inf, inf), drop=20.,
+               max_steps=60):
+    """
+    Find the range of x over which the log density `log_func` is within
+    `drop` of its peak, using a modest number of scalar evaluations, so a
+    grid can be placed without hand-tuning its limits.
+
+    The peak is bracketed by stepping uphill from `x0` with doubling steps,
+    then located by bounded minimization; the curvature of the log density
+    there sets the initial step for expanding outward on each side (again
+    doubling) until the log density falls `drop` below the peak (or a bound
+    is reached).  Each limit is then tightened by a few bisections.  For a
+    multimodal density, secondary modes beyond a deep enough trough will
+    not be included.
+
+    Parameters
+    ----------
+    log_func : function
+        Function evaluating the log density (up to a constant) at a scalar
+
+    x0 : float
+        Starting guess for the location of the peak
+
+    scale : float
+        Rough scale of the width of the peak, for the initial steps
+
+    bounds : 2-tuple of floats
+        Hard limits on x (e.g., (0, inf) for a rate)
+
+    drop : float
+        Fall in the log density defining the ends of the range; 20 puts the
+        ends beyond 6 std devns for a normal density
+
+    max_steps : int
+        Maximum number of doubling steps in each search
+
+    Returns
+    -------
+    x_l, x_u : floats
+        The lower and upper limits of the range
+
+    mode : float
+        The location of the peak
+
+    sig : float
+        The width of the peak, from the curvature of the log density there
+        (or a bracket width, if the curvature is unavailable); a grid over
+        the range should have spacing well below this
+    """
+    lo, hi = bounds
+    f = lambda x: float(log_func(x))
+
+    # Step uphill to bracket the peak.
+    x0 = clip(x0, lo, hi)
+    f0 = f(x0)
+    x_r = clip(x0 + scale, lo, hi)
+    step = scale if f(x_r) >= f0 else -scale
+    a, b, fb = x0, x0, f0
+    for i in range(max_steps):
+        c = clip(b + step, lo, hi)
+        fc = f(c)
+        if c == b or fc < fb:
+            break
+        a, b, fb = b, c, fc
+        step *= 2.
+    a, c = sorted([a, c])
+    if a == c:  # peak at a bound
+        mode, f_max = b, fb
+    else:
+        res = minimize_scalar(lambda x: -f(x), bounds=(a, c),
+                              method='bounded',
+                              options={'xatol': 1e-6*(c - a)})
+        mode, f_max = res.x, -res.fun
+        if fb > f_max:
+            mode, f_max = b, fb
+
+    # Use the curvature to set the expansion step size; fall back on the
+    # bracket or input scale for a peak at a bound (or a flat density).
+    h = 1e-3*scale
+    d2 = (f(mode + h) - 2.*f_max + f(mode - h))/h**2 \
+        if lo < mode - h and mode + h < hi else 0.
+    if isfinite(d2) and d2 < 0.:
+        sig = 1./sqrt(-d2)
+    else:
+        sig = max([c - a, scale])
+
+    # Expand outward until the log density drops enough, then bisect.
+    thresh = f_max - drop
+    limits = []
+    for sign, bound in ((-1., lo), (1., hi)):
+        inside, step = mode, sig
+        for i in range(max_steps):
+            x = mode + sign*step
+            if sign*(x - bound) >= 0.:
+                x = bound
+                if f(x) >= thresh:
+                    inside = x
+                break
+            if f(x) < thresh:
+                break
+            inside = x
+            step *= 2.
+        if inside != x:
+            for i in range(8):
+                mid = 0.5*(inside + x)
+                if f(mid) >= thresh:
+                    inside = mid
+                else:
+                    x = mid
+            inside = x  # keep the end just below the threshold
+        limits.append(inside)
+    return limits[0], limits[1], mode, sig
+
+
+def _gpd_fit(x):
+    """
+    Fit generalized Pareto dist'ns to rows of sorted positive exceedances
+    `x` (shape (K, M)), returning arrays of the shape, k, and scale, sigma,
+    using the empirical Bayes estimator of Zhang & Stephens (2009), with
+    the weak prior for k of Vehtari et al.'s PSIS.
+    """
+    n_rows, m = x.shape
+    n_b = 30 + int(sqrt(m))
+    # Candidate values of b = -k/sigma:
+    b = 1. - sqrt(n_b/(arange(1, n_b + 1) - 0.5))
+    b = b/(3.*x[:, int(m/4. + 0.5) - 1, newaxis]) + 1./x[:, -1, newaxis]
+    k = log1p(-b[:, :, newaxis]*x[:, newaxis, :]).mean(axis=2)
+    log_like = m*(log(-b/k) - k - 1.)
+    # Posterior weights for the candidates, and the posterior mean b:
+    wts = 1./exp(log_like[:, newaxis, :] - log_like[:, :, newaxis]).sum(axis=2)
+    wts = where(wts >= 10*np.finfo(float).eps, wts, 0.)
+    b = (b*wts).sum(axis=1)/wts.sum(axis=1)
+    k = log1p(-b[:, newaxis]*x).mean(axis=1)
+    sigma = -k/b
+    k = (m*k + 10*0.5)/(m + 10)  # shrink toward k = 0.5
+    return k, sigma
+
+
+def psis(log_w):
+    """
+    Pareto-smooth importance weights: the largest weights in each row of
+    `log_w` are replaced by the expected order statistics of a generalized
+    Pareto dist'n fitted to them (Vehtari, Gelman & Gabry's PSIS), which
+    stabilizes importance sampling estimates when the weights have a heavy
+    tail.
+
+    Parameters
+    ----------
+    log_w : float array
+        Log importance weights, with shape (n,) or (K, n) for K sets of
+        weights for the same n samples
+
+    Returns
+    -------
+    log_w : float array
+        The smoothed log weights, normalized (so the weights sum to 1)
+
+    k_hat : float or float array
+        The estimated Pareto shape parameters; for k_hat < 0.5 the estimates
+        are reliable, for 0.5 < k_hat < 0.7 they are usable, and for larger
+        values they are unreliable; inf is returned when there are too few
+        samples for a fit, and -inf when the largest weights are all equal
+    """
+    log_w = array(log_w, dtype=float)
+    single = log_w.ndim == 1
+    log_w = np.atleast_2d(log_w)
+    n_rows, n = log_w.shape
+    log_w = log_w - log_w.max(axis=1)[:, newaxis]
+    k_hat = inf*ones(n_rows)
+
+    # The tail holds the M largest weights.
+    m = int(ceil(min([0.2*n, 3.*sqrt(n)])))
+    if m > 4:
+        rows = arange(n_rows)[:, newaxis]
+        order = log_w.argsort(axis=1)
+        tail = order[:, -m:]
+        cut = exp(log_w[rows, order[:, -m-1:-m]])
+        with np.errstate(all='ignore'):
+            exceed = exp(log_w[rows, tail]) - cut
+            spread = exceed[:, -1] > exceed[:, 0]
+            k, sigma = _gpd_fit(where(spread[:, newaxis], exceed, 1.))
+        k_hat = where(spread, k, -inf)
+        fit = isfinite(k_hat) & (sigma > 0.)
+        if fit.any():
+            # Expected order statistics of the fitted dist'n:
+            p = (arange(m) + 0.5)/m
+            k, sigma = k[fit, newaxis], sigma[fit, newaxis]
+            k_safe = where(abs(k) > 1e-12, k, 1.)
+            quant = where(abs(k) > 1e-12,
+                          sigma*expm1(-k*log1p(-p))/k_safe,
+                          -sigma*log1p(-p))
+            with np.errstate(divide='ignore'):
+                smoothed = log(quant + cut[fit])
+            # Don't let smoothing exceed the largest raw weight.
+            log_w[rows[fit], tail[fit]] = where(smoothed < 0., smoothed, 0.)
+
+    top = log_w.max(axis=1)[:, newaxis]
+    log_w -= top + log(exp(log_w - top).sum(axis=1))[:, newaxis]
+    if single:
+        return log_w[0], k_hat[0]
+    return log_w, k_hat
+
+
 class UnivariateBayesianInference(object):
     """
     Implement Bayesian inference for a univariate model, using quadrature for
     integrals.
+
+    Only the marginal likelihood is computed when an instance is created;
+    other posterior summaries (the grid PDF and CDF, moments, and mode) are
+    computed when first accessed, and then cached.
     """
 
-    def __init__(self, param_grid, prior, lfunc=None, llfunc=None):
+    def __init__(self, param_grid, prior, lfunc=None, llfunc=None, tol=None,
+                 refine='local', max_grid=100000, cache_size=1000):
         """
         Calculate the posterior distribution over a grid in parameter space.
 
@@ -33,7 +596,9 @@ class UnivariateBayesianInference(object):
         Parameters
         ----------
         param_grid : float array
-            Array of parameter values; assumed equally spaced
+            Array of parameter values, in increasing order; they need not be
+            equally spaced (e.g., a log-spaced grid for a scale parameter).
+            If `tol` is given, this is a coarse starting grid.
 
         prior : float or function
             Prior PDF for the param, as a constant for flat prior, or
@@ -43,54 +608,523 @@ class UnivariateBayesianInference(object):
             Function that can evaluate the likelihood on an array
 
         llfunc : function
-            Function that can evaluate the log-likelihood on an array
+            Function that can evaluate the log-likelihood on an array;
+            preferred for large datasets, since all calculations are then
+            done in log space (see `log_mlike`)
+
+        tol : float
+            If given, refine `param_grid` to this tolerance, as specified
+            by `refine`
+
+        refine : 'local' or 'double'
+            With 'local', adaptively split intervals until the estimated
+            trapezoid-rule error in each is below `tol` times the marginal
+            likelihood; the result is a non-uniform grid, dense only where
+            the posterior needs it (see `refine_grid`).  With 'double',
+            repeatedly double the whole grid until the marginal likelihood
+            and posterior mean and std devn converge; these are then
+            reported with Richardson extrapolation (see `double_grid`).
+
+        max_grid : int
+            Maximum size of a refined grid
+
+        cache_size : int
+            Maximum number of log quasiposterior values to keep in an LRU
+            cache for scalar and small-array evaluations (used by mode
+            finding, Laplace approximations, etc.); 0 disables the cache
         """
-        self.param_grid = param_grid
-        self.delta = param_grid[1] - param_grid[0]
+        self._set_grid(param_grid)
+        param_grid = self.param_grid
+        self.cache_size = cache_size
+        self.clear_cache()
+        self.window = None  # no sliding window for `update`
         self.prior = prior
         self.lfunc = lfunc
         self.llfunc = llfunc
+        self.post_dist = None  # no analytic posterior
 
-        # Evaluate prior and likelihood over the grid.
-        self.qvals = self.quasi(param_grid)
+        # Evaluate log(prior*likelihood) over the grid; working with logs
+        # keeps large datasets from under/overflowing the quasiposterior.
+        # The log prior and log likelihood are cached separately, so the
+        # prior may be changed without recomputing the likelihood.
+        extrap = None
+        if tol is None:
+            self.log_prior_vals = self.log_prior(param_grid)
+            self.log_like_vals = self.log_like(param_grid)
+        else:
+            log_qvals = self.log_quasi(param_grid)
+            if refine == 'local':
+                param_grid, log_qvals = refine_grid(self.log_quasi, param_grid,
+                                                    log_qvals, tol, max_grid)
+            elif refine == 'double':
+                param_grid, log_qvals, extrap = double_grid(
+                    self.log_quasi, param_grid, log_qvals, tol, max_grid)
+            else:
+                raise ValueError('Invalid refine option!')
+            # Recover the log likelihood from log(q), except where the prior
+            # vanishes.
+            self.log_prior_vals = self.log_prior(param_grid)
+            zero = ~isfinite(self.log_prior_vals)
+            self.log_like_vals = log_qvals - where(zero, 0., self.log_prior_vals)
+            if zero.any():
+                self.log_like_vals[zero] = self.log_like(param_grid[zero])
+            self._set_grid(param_grid)
+        self._normalize(extrap)
 
-        # Bayes's theorem, using the trapezoid rule for the marginal likeilhood:
-        self.mlike = np.trapz(self.qvals, dx=self.delta)
-        self.post_pdf = self.qvals/self.mlike
+    def _set_grid(self, param_grid):
+        """
+        Check and store the parameter grid, and initialize accept/reject
+        bookkeeping.
+        """
+        param_grid = asarray(param_grid, dtype=float)
+        if len(param_grid) < 3:
+            raise ValueError('Need at least 3 grid points!')
+        if (diff(param_grid) <= 0.).any():
+            raise ValueError('Grid must be in strictly increasing order!')
+        self.param_grid = param_grid
+
+        # Grid spacings; `delta` is the common spacing for an equally spaced
+        # grid, and None otherwise.
+        self.deltas = diff(param_grid)
+        if allclose(self.deltas, self.deltas[0]):
+            self.delta = self.deltas[0]
+        else:
+            self.delta = None
 
         # Info for accept/reject method:
         self.span = param_grid[-1] - param_grid[0]
-        self.max_pdf = self.post_pdf.max()
-        self.n_ar = 0  # count iterations for efficiency estimates
-
-        # Calculate posterior mean and std devn.
-        self.post_mean = np.trapz(self.param_grid*self.post_pdf, dx=self.delta)
-        m2 = np.trapz(self.param_grid**2 * self.post_pdf, dx=self.delta)
-        self.post_std = sqrt(m2 - self.post_mean**2)
-
-        # Calculate the posterior CDF.
-        self.post_cdf = zeros_like(self.post_pdf)
-        for i in range(1, len(param_grid)):
-            dp = 0.5*self.delta*(self.post_pdf[i-1] + self.post_pdf[i])
-            self.post_cdf[i] = self.post_cdf[i-1] + dp
-
-        # Find the location and q() value for the posterior mode; this is
-        # used for Laplace approximations and for accept/reject sampling.
-        # First just locate the max on the grid.
-        i_max = self.post_pdf.argmax()
-        # If the mode is on a boundary, then no refinement is necessary;
-        # otherwise, optimize to refine the mode.
-        if i_max == 0 or i_max == len(param_grid):  # mode on a boundary
-            self.mode = param_grid[i_max]
-            self.mode_q = self.qvals[i_max]
-        else:  # optimize to find the mode
-            # Starting values for bracketing mode.
-            a, c = self.param_grid[i_max-1], self.param_grid[i_max+1]
-            bounds = self.param_grid[0], self.param_grid[-1]
-            results = minimize_scalar(self._neg_log_q, (a, c), bounds)
-            self.mode = results.x
-            self.mode_q = exp(-results.fun)
-        self.mode_pdf = self.mode_q/self.mlike
+        self.n_ar = 0  # count proposals for efficiency estimates
+        self.n_ar_acc = 0  # count accepted proposals
+        self.n_ar_blocks = 0  # count vectorized proposal blocks
+        self.t_ar = 0.  # time spent in accept/reject sampling
+
+    def _init_analytic(self, param_grid, prior, post_dist, log_mlike, mode,
+                       lfunc=None, llfunc=None, cache_size=1000):
+        """
+        Initialize an instance whose posterior is known in closed form (e.g.,
+        for a conjugate prior), for use by subclass initializers in place
+        of the base class __init__.  The PDF, CDF, moments, quantiles, and
+        samples then come from `post_dist`.
+
+        The grid is stored but not evaluated; it is used for plotting, and
+        the quasiposterior is only evaluated on it (by `_ensure_grid`) if a
+        grid-based method (e.g., `laplace`) needs it.
+
+        Parameters
+        ----------
+        param_grid : float array
+            Array of parameter values, in increasing order
+
+        prior : float or function
+            Prior PDF for the param (see __init__)
+
+        post_dist : frozen scipy.stats distribution
+            The posterior distribution
+
+        log_mlike : float
+            Log marginal likelihood
+
+        mode : float
+            Location of the posterior mode
+
+        lfunc, llfunc : function
+            Likelihood or log-likelihood function (see __init__)
+
+        cache_size : int
+            Size of the log quasiposterior cache (see __init__)
+        """
+        self._set_grid(param_grid)
+        self.cache_size = cache_size
+        self.clear_cache()
+        self.window = None  # no sliding window for `update`
+        self.prior = prior
+        self.lfunc = lfunc
+        self.llfunc = llfunc
+        self.post_dist = post_dist
+        self._analytic_mode = mode
+        self.log_mlike = log_mlike
+        with np.errstate(over='ignore'):
+            self.mlike = exp(log_mlike)
+        self._grid_done = False  # grid values are computed on demand
+        self._reset_summaries()
+
+    def _ensure_grid(self):
+        """
+        Evaluate the log prior, log likelihood, and log quasiposterior on the
+        grid, if an instance with an analytic posterior has not done so yet
+        (for the current data).  Methods using these grid values call this
+        first.
+        """
+        if self._grid_done:
+            return
+        log_mlike = self.log_mlike
+        self.log_prior_vals = self.log_prior(self.param_grid)
+        self.log_like_vals = self.log_like(self.param_grid)
+        self._normalize()
+        # Keep the exact marginal likelihood.
+        self.log_mlike = log_mlike
+        with np.errstate(over='ignore'):
+            self.mlike = exp(log_mlike)
+
+    def _normalize(self, extrap=None):
+        """
+        Combine the cached log prior and log likelihood, and normalize the
+        result.  Only the marginal likelihood is computed here; other
+        summaries are computed (and cached) on first use.
+        """
+        self.log_qvals = self.log_prior_vals + self.log_like_vals
+
+        # Bayes's theorem, using the trapezoid rule for the marginal likeilhood.
+        # Shift log(q) by its max before exponentiating (a log-sum-exp
+        # version of the trapezoid rule), so only values <= 1 are summed.
+        i_peak = self.log_qvals.argmax()
+        self.log_q_max = self.log_qvals[i_peak]
+        self._x_peak = self.param_grid[i_peak]
+        scaled_q = exp(self.log_qvals - self.log_q_max)
+        self._log_norm = self.log_q_max + log(np.trapz(scaled_q,
+                                                       self.param_grid))
+        self._extrap = extrap
+        self._grid_done = True
+        if extrap is None:
+            self.log_mlike = self._log_norm
+        else:
+            # Report the extrapolated value; the grid PDF and CDF keep
+            # their trapezoid normalization.
+            self.log_mlike = extrap[0]
+        with np.errstate(over='ignore'):
+            self.mlike = exp(self.log_mlike)
+        self._reset_summaries()
+
+    def set_prior(self, prior):
+        """
+        Replace the prior, recomputing the posterior from the cached
+        likelihood values on the grid.
+
+        Parameters
+        ----------
+        prior : float or function
+            Prior PDF for the param, as a constant for flat prior, or
+            a function that can evaluate the PDF on an array
+        """
+        # Evaluate the likelihood grid if the posterior was analytic.
+        self._ensure_grid()
+        self.post_dist = None
+        self.prior = prior
+        self.clear_cache()
+        self.log_prior_vals = self.log_prior(self.param_grid)
+        self._normalize()
+
+    def prior_sweep(self, priors):
+        """
+        Compute the posteriors for a collection of priors, reusing the cached
+        likelihood values on the grid, with all of the posteriors normalized
+        and summarized at once.
+
+        Parameters
+        ----------
+        priors : sequence, or 2-D float array
+            Either a sequence of K priors (each a constant or a function that
+            can evaluate the PDF on an array), or an array of shape (K, N)
+            of prior PDF values on the N-point grid
+
+        Returns
+        -------
+        posts : GridPosteriors instance
+            The K posteriors, with vectors of marginal likelihoods, means,
+            and std devns, and (K, N) arrays of PDF and CDF values
+        """
+        with np.errstate(divide='ignore'):
+            if isinstance(priors, np.ndarray) and priors.ndim == 2:
+                log_priors = log(priors)
+            else:
+                log_priors = array([self.log_prior(self.param_grid, prior)
+                                    for prior in priors])
+        self._ensure_grid()
+        return GridPosteriors(self.param_grid,
+                              log_priors + self.log_like_vals)
+
+    # Subclasses supporting `update` define the shape of a single datum
+    # (e.g., (2,) for an (interval, count) pair), and the following hooks.
+    _datum_shape = ()
+
+    def _data_items(self):
+        """
+        Return the current data as an array of data items (for starting a
+        sliding window).
+        """
+        raise NotImplementedError('Updating not supported for this model!')
+
+    def _data_log_like(self, items):
+        """
+        Return the log likelihood for an array of data items on the grid.
+        """
+        raise NotImplementedError('Updating not supported for this model!')
+
+    def _add_data(self, items, sign=1):
+        """
+        Add an array of data items to the model's data (or remove them, as
+        the oldest items, for sign=-1).
+        """
+        raise NotImplementedError('Updating not supported for this model!')
+
+    def _analytic_posterior(self):
+        """
+        Return the analytic posterior dist'n, log marginal likelihood, and
+        mode for the current data, or None if there is none.
+        """
+        return None
+
+    def update(self, new_data, window=None):
+        """
+        Update the posterior with new data.  The log likelihood of the new
+        data is added to the cached log likelihood on the grid and the
+        posterior is renormalized; derived summaries are recomputed only
+        when next used.  An analytic (conjugate) posterior is updated in
+        closed form.
+
+        The grid is not changed, so it should span the posterior for the
+        updated data.
+
+        Parameters
+        ----------
+        new_data : float or float array
+            New data, as a single datum or an array of data (with the
+            structure of a datum defined by the model subclass)
+
+        window : int
+            If given, from now on keep only the `window` most recent data
+            items, dropping the oldest ones with each update (the factors
+            for dropped items are divided out of the likelihood); data
+            already in the model when the window is first set count as
+            the items returned by the model's `_data_items` (e.g., pooled
+            counts count as a single item)
+        """
+        items = asarray(new_data, dtype=float)
+        items = items.reshape((-1,) + self._datum_shape)
+        if window is not None:
+            if self.window is None:
+                self._window_items = deque(self._data_items())
+            self.window = window
+
+        # Find the items leaving the window.
+        dropped = None
+        if self.window is not None:
+            self._window_items.extend(items)
+            n_drop = len(self._window_items) - self.window
+            if n_drop > 0:
+                dropped = array([self._window_items.popleft()
+                                 for i in range(n_drop)])
+
+        if self.post_dist is None:
+            d_log_like = self._data_log_like(items)
+            if dropped is not None:
+                with np.errstate(invalid='ignore'):  # -inf - -inf is fixed below
+                    d_log_like = d_log_like - self._data_log_like(dropped)
+        self._add_data(items)
+        if dropped is not None:
+            self._add_data(dropped, -1)
+        self.clear_cache()
+
+        if self.post_dist is not None:
+            # Forget any grid values computed for the old data.
+            self._grid_done = False
+            post = self._analytic_posterior()
+            if post is not None:
+                self.post_dist, self.log_mlike, self._analytic_mode = post
+                with np.errstate(over='ignore'):
+                    self.mlike = exp(self.log_mlike)
+                self._reset_summaries()
+                return
+            # The grid no longer spans the analytic posterior; evaluate the
+            # posterior on the grid from now on.
+            self._ensure_grid()
+            self.post_dist = None
+        else:
+            with np.errstate(invalid='ignore'):
+                self.log_like_vals = self.log_like_vals + d_log_like
+            # Where dropped data had zero likelihood, the factors can't be
+            # divided out; evaluate the likelihood there directly.
+            bad = isnan(self.log_like_vals)
+            if bad.any():
+                self.log_like_vals[bad] = self.log_like(self.param_grid[bad])
+        self._normalize()
+
+    def _reset_summaries(self):
+        """
+        Clear cached posterior summaries, so they are recomputed from the
+        grid when next needed.
+        """
+        self._post_pdf = None
+        self._moments = None  # (mean, std devn, CDF)
+        self._mode = None  # (mode, log q at mode)
+        self._all_modes = None  # (locations, log q values, masses)
+        self._guide = None  # guide table for fast CDF inversion
+
+    @property
+    def qvals(self):
+        """
+        Quasiposterior (prior*likelihood) values on the grid; these may
+        under/overflow for large datasets (`log_qvals` will not).
+        """
+        self._ensure_grid()
+        with np.errstate(over='ignore'):
+            return exp(self.log_qvals)
+
+    @property
+    def post_pdf(self):
+        """
+        Posterior PDF values on the grid.
+        """
+        if self._post_pdf is None:
+            if self.post_dist is not None:
+                self._post_pdf = self.post_dist.pdf(self.param_grid)
+            else:
+                self._post_pdf = exp(self.log_qvals - self._log_norm)
+        return self._post_pdf
+
+    @property
+    def max_pdf(self):
+        """
+        Largest posterior PDF value on the grid.
+        """
+        if self.post_dist is not None:
+            return self.post_pdf.max()
+        return exp(self.log_q_max - self._log_norm)
+
+    def _grid_moments(self):
+        """
+        Return the posterior mean, std devn, and CDF on the grid, computing
+        them (in a single cumulative-trapezoid pass) on first use.
+        """
+        if self._moments is None and self.post_dist is not None:
+            self._moments = (self.post_dist.mean(), self.post_dist.std(),
+                             self.post_dist.cdf(self.param_grid))
+        elif self._moments is None:
+            scaled_q = exp(self.log_qvals - self.log_q_max)
+            norm, mean, var, cum = trapz_pass(self.param_grid, scaled_q,
+                                              self._x_peak)
+            # Use extrapolated moments, if available.
+            if self._extrap is not None:
+                mean, var = self._extrap[1], self._extrap[2]**2
+            self._moments = mean, sqrt(var), cum/norm
+        return self._moments
+
+    @property
+    def post_mean(self):
+        """
+        Posterior mean.
+        """
+        return self._grid_moments()[0]
+
+    @property
+    def post_std(self):
+        """
+        Posterior standard deviation.
+        """
+        return self._grid_moments()[1]
+
+    @property
+    def post_cdf(self):
+        """
+        Posterior CDF values on the grid.
+        """
+        return self._grid_moments()[2]
+
+    def _find_mode(self):
+        """
+        Return the location and log(q) value for the posterior mode,
+        computing them on first use.  These are used for Laplace
+        approximations and for accept/reject sampling.
+        """
+        if self._mode is None and self.post_dist is not None:
+            mode = self._analytic_mode
+            self._mode = mode, self.log_quasi(mode)
+        elif self._mode is None:
+            # Refine every local max, and take the highest as the global
+            # mode; the grid argmax may lie in the wrong basin when a
+            # multimodal posterior has peaks of similar height.
+            locs, log_qs, masses = self._find_all_modes()
+            k = log_qs.argmax()
+            self._mode = locs[k], log_qs[k]
+        return self._mode
+
+    def _find_all_modes(self):
+        """
+        Return arrays of the locations, log(q) values, and probability
+        masses of all local maxima of the posterior, computing them on
+        first use.
+        """
+        if self._all_modes is None:
+            self._ensure_grid()
+            grid, log_q = self.param_grid, self.log_qvals
+            # Grid-local maxima, including the boundaries (a plateau is
+            # counted once, at its left end):
+            up = append(True, log_q[1:] > log_q[:-1])
+            down = append(log_q[:-1] >= log_q[1:], True)
+            peaks = nonzero(up & down & isfinite(log_q))[0]
+
+            # Refine interior peaks together; the grid neighbors bound
+            # each mode.
+            locs, log_qs = grid[peaks], log_q[peaks]
+            inner = (peaks > 0) & (peaks < len(grid) - 1)
+            if inner.any():
+                i = peaks[inner]
+                x, f = golden_max(self.log_quasi, grid[i-1], grid[i+1])
+                better = f > log_qs[inner]
+                locs[inner] = where(better, x, locs[inner])
+                log_qs[inner] = where(better, f, log_qs[inner])
+
+            # The basin of each mode extends to the lowest grid points
+            # between it and its neighboring modes.
+            edges = [0]
+            for i, j in zip(peaks[:-1], peaks[1:]):
+                edges.append(i + log_q[i:j+1].argmin())
+            edges.append(len(grid) - 1)
+            masses = diff(self.post_cdf[edges])
+            self._all_modes = locs, log_qs, masses
+        return self._all_modes
+
+    @property
+    def all_modes(self):
+        """
+        Arrays of the locations, PDF values, and probability masses of all
+        of the local maxima (modes) of the posterior, in order of location.
+        The mass of a mode is the posterior probability of its basin,
+        which extends to the lowest points between it and its neighbors.
+        """
+        if self.post_dist is not None:
+            return (array([self.mode]), array([self.mode_pdf]), array([1.]))
+        locs, log_qs, masses = self._find_all_modes()
+        return locs, exp(log_qs - self.log_mlike), masses
+
+    @property
+    def mode(self):
+        """
+        Location of the posterior mode.
+        """
+        return self._find_mode()[0]
+
+    @property
+    def mode_log_q(self):
+        """
+        Log quasiposterior at the posterior mode.
+        """
+        return self._find_mode()[1]
+
+    @property
+    def mode_q(self):
+        """
+        Quasiposterior at the posterior mode.
+        """
+        with np.errstate(over='ignore'):
+            return exp(self.mode_log_q)
+
+    @property
+    def mode_pdf(self):
+        """
+        Posterior PDF at the mode.
+        """
+        return exp(self.mode_log_q - self.log_mlike)
 
     def laplace(self, g=None):
         """
@@ -118,32 +1152,175 @@ class UnivariateBayesianInference(object):
                 return ones_like(param_vals)
         gvals = g(self.param_grid)
 
-        # Find the peak of g*q on the grid.
-        gqvals = gvals * self.qvals
-        i_max = gqvals.argmax()
-        if i_max == 0 or i_max == len(self.param_grid):
+        # Find the peak of g*q on the grid (using logs, to avoid underflow).
+        self._ensure_grid()
+        with np.errstate(divide='ignore'):
+            log_gqvals = log(gvals) + self.log_qvals
+        i_max = log_gqvals.argmax()
+        if i_max == 0 or i_max == len(self.param_grid) - 1:
             raise ValueError('Laplace not possible; peak is on a boundary!')
 
         # Refine the peak via optimization of -log(g*q).
         def f_opt(param):
             return -log(g(param)) + self._neg_log_q(param)
 
-        # Starting values for bracketing mode.
+        # The grid neighbors bound the peak.
         a, c = self.param_grid[i_max-1], self.param_grid[i_max+1]
-        bounds = self.param_grid[0], self.param_grid[-1]
-        results = minimize_scalar(f_opt, (a, c), bounds)
+        results = minimize_scalar(f_opt, bounds=(a, c), method='bounded',
+                                  options={'xatol': 1.e-6*(c - a)})
         locn = results.x
-        ampl = exp(-results.fun)
+        with np.errstate(over='ignore'):
+            ampl = exp(-results.fun)
 
-        # Find the curvature via 2nd differencing.
+        # Find the curvature via 2nd differencing of log(g*q) at the peak;
+        # there d2(gq)/gq = d2 log(gq), since the 1st derivative vanishes.
         h = .01*self.post_std
-        params = array([self.mode-h, self.mode, self.mode+h])
-        gqvals = g(params)*self.quasi(params)
-        d2gq = (gqvals[0] - 2*gqvals[1] + gqvals[2])/h**2
-        sig_lap = 1./sqrt(-d2gq/ampl)
+        params = array([locn-h, locn, locn+h])
+        log_gq = log(g(params)) + self.log_quasi(params)
+        d2lgq = (log_gq[0] - 2*log_gq[1] + log_gq[2])/h**2
+        sig_lap = 1./sqrt(-d2lgq)
 
         return ampl, locn, sig_lap, rt2pi*sig_lap*ampl
 
+    def expect(self, gs):
+        """
+        Compute the posterior expectations and variances of many functions
+        at once, by trapezoid-rule quadrature over the grid.  The functions
+        are evaluated on the grid as a (K x N) matrix, and the integrals are
+        matrix-vector products with the trapezoid-weighted posterior PDF.
+
+        The quadrature error of each expectation is estimated by comparison
+        with the trapezoid rule using every other grid point (plus the last
+        point, for an even number of points, so both rules span the grid);
+        the error of the full-grid rule is about 1/3 of their difference.
+
+        Parameters
+        ----------
+        gs : list of functions, or function
+            Either a list of K functions, each accepting an array, or a
+            single function; a single function may return an array of
+            values at each point of an array x (for one function), or a
+            (K, len(x)) array of the values of K functions
+
+        Returns
+        -------
+        means, variances, errs : floats or float arrays
+            The posterior expectations and variances of the K functions,
+            and the estimated quadrature errors of the expectations; these
+            are floats if `gs` is a single function returning a 1-D array
+        """
+        grid = self.param_grid
+        if callable(gs):
+            gvals = asarray(gs(grid), dtype=float)
+        else:
+            gvals = array([g(grid) for g in gs], dtype=float)
+        single = gvals.ndim == 1
+        gvals = np.atleast_2d(gvals)
+
+        # Normalize with the same weights, so constants have exact
+        # expectations.
+        wp = trapz_weights(grid)*self.post_pdf
+        wp /= wp.sum()
+        means = dot(gvals, wp)
+        variances = dot(gvals**2, wp) - means**2
+        variances = where(variances > 0., variances, 0.)
+
+        coarse = arange(0, len(grid), 2)
+        if coarse[-1] != len(grid) - 1:
+            coarse = append(coarse, len(grid) - 1)
+        wp2 = trapz_weights(grid[coarse])*self.post_pdf[coarse]
+        wp2 /= wp2.sum()
+        errs = abs(means - dot(gvals[:, coarse], wp2))/3.
+        if single:
+            return means[0], variances[0], errs[0]
+        return means, variances, errs
+
+    def laplace_batch(self, gs):
+        """
+        Calculate Laplace approximations for the integrals of many functions
+        g() times the (unnormalized) posterior PDF at once.  The peaks of
+        all of the g*q integrands are refined together (by golden section
+        search between grid neighbors), and their curvatures are found from
+        second differences, as in `laplace`.
+
+        Parameters
+        ----------
+        gs : list of functions, or function
+            Either a list of K functions, each accepting an array, or a
+            single function; a single function may return an array of
+            values at each point of an array x (for one function), or a
+            (K, len(x)) array of the values of K functions
+
+        Returns
+        -------
+        ampl, locn, sig, est : floats or float arrays
+            The amplitudes, locations, and std devns of Gaussian approx'ns
+            to the K integrands, and the Laplace approx'ns for the integrals;
+            these are nan for integrands peaking on a grid boundary
+
+        rel_err : float or float array
+            The relative differences of the Laplace estimates from the
+            integrals computed by quadrature over the grid, as a check on
+            the accuracy of the Laplace approximations
+
+        All of these are floats if `gs` is a single function returning a
+        1-D array.
+        """
+        if callable(gs):
+            gvals = asarray(gs(self.param_grid), dtype=float)
+
+            def g_at(rows, x):
+                # Function `rows[j]` at point x[j]: a diagonal of the values
+                return np.atleast_2d(gs(x))[rows, arange(len(x))]
+        else:
+            gvals = array([g(self.param_grid) for g in gs], dtype=float)
+
+            def g_at(rows, x):
+                return array([gs[k](xk) for k, xk in zip(rows, x)])
+        single = gvals.ndim == 1
+        gvals = np.atleast_2d(gvals)
+
+        # Find the peaks of g*q on the grid (using logs, to avoid underflow).
+        self._ensure_grid()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_gqvals = log(gvals) + self.log_qvals
+        log_gqvals = where(isnan(log_gqvals), -inf, log_gqvals)
+        i_max = log_gqvals.argmax(axis=1)
+        rows = nonzero((i_max > 0) & (i_max < len(self.param_grid) - 1))[0]
+
+        def log_gq(x):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return log(g_at(rows, x)) + self.log_quasi(x)
+
+        # Refine the peaks together, and find the curvatures via 2nd
+        # differencing of log(g*q) at the peaks.
+        n_g = len(gvals)
+        log_ampl, locn, sig_lap = nan*ones(n_g), nan*ones(n_g), nan*ones(n_g)
+        if len(rows) > 0:
+            i = i_max[rows]
+            x, f = golden_max(log_gq, self.param_grid[i-1],
+                              self.param_grid[i+1])
+            h = .01*self.post_std
+            d2lgq = (log_gq(x - h) - 2*f + log_gq(x + h))/h**2
+            locn[rows] = x
+            log_ampl[rows] = f
+            with np.errstate(invalid='ignore'):
+                sig_lap[rows] = 1./sqrt(-d2lgq)
+        with np.errstate(over='ignore'):
+            ampl = exp(log_ampl)
+            est = rt2pi*sig_lap*ampl
+
+        # Compare with quadrature, in log space to avoid overflow.
+        m = log_gqvals.max(axis=1)
+        with np.errstate(invalid='ignore'):
+            norm = trapz_pass(self.param_grid,
+                              exp(log_gqvals - m[:, newaxis]))[0]
+            rel_err = expm1(log(rt2pi*sig_lap) + log_ampl - m - log(norm))
+
+        if single:
+            return ampl[0], locn[0], sig_lap[0], est[0], rel_err[0]
+        return ampl, locn, sig_lap, est, rel_err
+
     def norm_approx_pdf(self):
         """
         Return the location, scale, and amplitude for a Gaussian approximation
@@ -151,14 +1328,13 @@ class UnivariateBayesianInference(object):
         Laplace approximation, but is related to it and may be a useful
         approximation in its own right.
         """
-        i_max = self.post_pdf.argmax()
-        if i_max == 0 or i_max == len(self.param_grid):
+        if self.mode in (self.param_grid[0], self.param_grid[-1]):
             raise ValueError('Laplace not possible; mode is on a boundary!')
         h = .01*self.post_std
         params = array([self.mode-h, self.mode, self.mode+h])
-        qvals = self.quasi(params)
-        d2q = (qvals[0] - 2*qvals[1] + qvals[2])/h**2
-        self.sig_lap = 1./sqrt(-d2q/self.mode_q)
+        log_qvals = self.log_quasi(params)
+        d2lq = (log_qvals[0] - 2*log_qvals[1] + log_qvals[2])/h**2
+        self.sig_lap = 1./sqrt(-d2lq)
 
     def quasi(self, param_vals):
         """
@@ -181,46 +1357,605 @@ class UnivariateBayesianInference(object):
             like_vals = exp(like_vals)
         return prior_vals*like_vals
 
+    # Largest array of param values whose log(q) values are cached:
+    _cache_max_len = 64
+
+    def log_quasi(self, param_vals):
+        """
+        Return the log of the quasiposterior for the provided param values
+        (scalar or vector).  If `llfunc` was provided, the likelihood is
+        never exponentiated, so this is safe for very large datasets.
+
+        Values for scalars and small arrays are cached, so repeated
+        evaluations at the same points (e.g., the mode and its neighbors,
+        by `laplace` and `norm_approx_pdf`) call the likelihood only once.
+        """
+        param_vals = asarray(param_vals, dtype=float)
+        if not self.cache_size or param_vals.size > self._cache_max_len:
+            return self.log_prior(param_vals) + self.log_like(param_vals)
+
+        cache = self._cache
+        flat = param_vals.ravel()
+        log_q = empty(flat.shape)
+        miss = []
+        for k, x in enumerate(flat):
+            if x in cache:
+                log_q[k] = cache[x] = cache.pop(x)  # move to the end
+            else:
+                miss.append(k)
+        self.n_cache_hits += len(flat) - len(miss)
+        self.n_cache_misses += len(miss)
+        if miss:
+            new = flat[miss]
+            log_q[miss] = self.log_prior(new) + self.log_like(new)
+            for x, val in zip(new, log_q[miss]):
+                cache[x] = val
+            while len(cache) > self.cache_size:  # drop least recently used
+                cache.popitem(last=False)
+        return log_q.reshape(param_vals.shape)[()]  # scalar for a scalar
+
+    def clear_cache(self):
+        """
+        Empty the cache of log quasiposterior values, and reset its hit and
+        miss counters.  This is done automatically when the prior is
+        changed via `set_prior`; call it if the likelihood is changed.
+        """
+        self._cache = OrderedDict()
+        self.n_cache_hits = 0
+        self.n_cache_misses = 0
+
+    def cache_stats(self):
+        """
+        Return a dict summarizing the log quasiposterior cache: its size,
+        and the numbers of hits and misses, and the hit rate.
+        """
+        n_calls = self.n_cache_hits + self.n_cache_misses
+        rate = self.n_cache_hits/n_calls if n_calls else nan
+        return dict(size=len(self._cache), hits=self.n_cache_hits,
+                    misses=self.n_cache_misses, hit_rate=rate)
+
+    def log_prior(self, param_vals, prior=None):
+        """
+        Return the log prior PDF for the provided param values (scalar or
+        vector), for the current prior, or for `prior` if it is provided.
+        """
+        if prior is None:
+            prior = self.prior
+        param_vals = asarray(param_vals)  # to handle sequence & scalar inputs
+        if callable(prior):
+            return log_pdf(prior, param_vals)
+        with np.errstate(divide='ignore'):  # log(0) -> -inf is OK here
+            return log(prior)*ones_like(param_vals, dtype=float)
+
+    def log_like(self, param_vals):
+        """
+        Return the log likelihood for the provided param values (scalar or
+        vector).
+        """
+        param_vals = asarray(param_vals)  # to handle sequence & scalar inputs
+        if self.lfunc:
+            if self.llfunc:
+                raise ValueError('Cannot specify both lfunc & llfunc!')
+            with np.errstate(divide='ignore'):  # log(0) -> -inf is OK here
+                return log(self.lfunc(param_vals))
+        else:
+            if self.llfunc is None:
+                raise ValueError('Must specify either lfunc or llfunc!')
+            return self.llfunc(param_vals)
+
     def pdf(self, param_vals):
         """
         Return the posterior density for the provided param values
         (scalar or vector).
         """
-        return self.quasi(param_vals)/self.mlike
+        if self.post_dist is not None:
+            return self.post_dist.pdf(param_vals)
+        return exp(self.log_quasi(param_vals) - self.log_mlike)
+
+    def cdf(self, param_vals):
+        """
+        Return the posterior CDF for the provided param values (scalar or
+        vector), interpolating linearly in the CDF grid.
+        """
+        if self.post_dist is not None:
+            return self.post_dist.cdf(param_vals)
+        return np.interp(param_vals, self.param_grid, self.post_cdf)
+
+    def ppf(self, q):
+        """
+        Return the posterior quantiles (the inverse CDF, or percent point
+        function) for the provided probabilities `q` (scalar or vector).
+        """
+        if self.post_dist is not None:
+            return self.post_dist.ppf(q)
+        return self._inv_cdf(q)
 
     def _neg_log_q(self, param):
         """
         Return the negative log prior*likelihood, for optimization; `param`
         should be a single (scalar) parameter value.
         """
-        return -log(self.quasi(param))
+        return -self.log_quasi(param)
+
+    def samp_cdf(self, n=None, rng=None, guide=False, method='random'):
+        """
+        Return samples from the posterior using the inverse CDF method.
+
+        Parameters
+        ----------
+        n : int
+            Number of samples; if None, a single (scalar) sample is returned,
+            otherwise an array of `n` samples
+
+        rng : random number generator or int
+            Object whose `random(size)` method returns uniform variates,
+            e.g., a `numpy.random.Generator`, or a seed for a new Generator;
+            if None, NumPy's global generator is used (see `get_rng`)
+
+        guide : bool
+            If True, locate CDF cells with a guide table (built on first use
+            and cached), so each sample costs O(1) time on average rather
+            than the O(log N) of a binary search over the N-point grid
+
+        method : 'random', 'stratified', 'antithetic', or 'sobol'
+            How the uniform variates are drawn (see `uniforms`); the
+            variance-reducing methods make averages over the samples more
+            accurate than for independent samples, but the samples are not
+            independent
+        """
+        rng = get_rng(rng)
+        u = uniforms(n, rng, method) if n is not None else rng.random()
+        if self.post_dist is not None:
+            return self.post_dist.ppf(u)
+        return self._inv_cdf(u, guide)
+
+    def _inv_cdf(self, u, guide=False):
+        """
+        Map uniform variates `u` (scalar or array) to parameter values by
+        linear interpolation in the posterior CDF grid.
+        """
+        u = asarray(u)
+        # Locate the CDF cells with cdf[i-1] < u <= cdf[i]; the clip handles
+        # u = 0 exactly.
+        if guide:
+            i = self._guide_search(u)
+        else:
+            i = self.post_cdf.searchsorted(u)
+        i = clip(i, 1, len(self.post_cdf) - 1)
+        cdf_l, cdf_u = self.post_cdf[i-1], self.post_cdf[i]
+        par_l, par_u = self.param_grid[i-1], self.param_grid[i]
+        # Linearly interpolate in the CDF grid, guarding against cells
+        # with no probability.
+        dcdf = cdf_u - cdf_l
+        frac = (u - cdf_l)/where(dcdf > 0., dcdf, 1.)
+        return par_l + frac*(par_u - par_l)
+
+    def _guide_search(self, u):
+        """
+        Return the indices of the first CDF grid points >= `u`, found with
+        the help of a guide table (Chen & Asau 1974).
+        """
+        # The guide table has one entry per CDF cell; entry k is the index of
+        # the first CDF value >= k/m.  Build it on first use.
+        if self._guide is None:
+            m = len(self.post_cdf) - 1
+            self._guide = self.post_cdf.searchsorted(arange(m)/m)
+        m = len(self._guide)
+        shape = u.shape
+        u = u.ravel()
+        i = maximum(self._guide[(u*m).astype(int)], 1)
+        # The guide entry lies at or before the sought index; step forward
+        # only where needed (on average about one step per variate).  Cells
+        # in the far tails can share a table entry, so the rare variates
+        # still behind after a few steps are finished by binary search.
+        behind = flatnonzero(self.post_cdf[i] < u)
+        for step in range(4):
+            if len(behind) == 0:
+                break
+            i[behind] += 1
+            behind = behind[self.post_cdf[i[behind]] < u[behind]]
+        else:
+            i[behind] = self.post_cdf.searchsorted(u[behind])
+        return i.reshape(shape)
 
-    def samp_cdf(self):
+    def samp_ar(self, n=None, rng=None, max_block=100000):
         """
-        Return a single sample from the posterior using the inverse CDF method.
+        Return samples from the posterior using the accept/reject method,
+        with a uniform proposal over the grid range.  This is valid for any
+        grid, but for grids spanning several decades the inverse CDF method
+        (`samp_cdf`) will be much more efficient.
+
+        Proposals are made in blocks, with the posterior PDF evaluated on
+        each block at once.  Block sizes are set from the running acceptance
+        rate, so that typically one or two blocks yield the needed samples.
+
+        Parameters
+        ----------
+        n : int
+            Number of samples; if None, a single (scalar) sample is returned,
+            otherwise an array of `n` samples
+
+        rng : random number generator or int
+            Object whose `random(size)` method returns uniform variates,
+            e.g., a `numpy.random.Generator`, or a seed for a new Generator;
+            if None, NumPy's global generator is used (see `get_rng`)
+
+        max_block : int
+            Maximum number of proposals per block (limits memory use)
         """
-        u = rand()
-        i = self.post_cdf.searchsorted(u)  # returns location with val > u
-        # Linearly interpolate in the CDF grid.
-        du_dpar = (self.post_cdf[i] - self.post_cdf[i-1]) / \
-            (self.param_grid[i] - self.param_grid[i-1])
-        du = u - self.post_cdf[i-1]
-        return self.param_grid[i-1] + du/du_dpar
+        if n == 0:
+            return np.empty(0)
+        rng = get_rng(rng)
+        n_want = 1 if n is None else n
+        # Envelope height; use the grid max if mode refinement fell short.
+        ceiling = max([self.mode_pdf, self.max_pdf])
+        t_start = time.time()
+        accepted = []
+        n_got = 0
+        while n_got < n_want:
+            # Estimate the acceptance rate from history, or from the ratio of
+            # the area under the PDF (1) to that under the envelope.
+            if self.n_ar_acc > 0:
+                rate = self.n_ar_acc/self.n_ar
+            else:
+                rate = 1./(self.span*ceiling)
+            n_prop = int(ceil(1.2*(n_want - n_got)/rate)) + 10
+            n_prop = int(min([n_prop, max_block]))
+            params = self.param_grid[0] + rng.random(n_prop)*self.span
+            y = rng.random(n_prop)*ceiling
+            params = params[y < self.pdf(params)]
+            accepted.append(params)
+            n_got += len(params)
+            self.n_ar += n_prop
+            self.n_ar_acc += len(params)
+            self.n_ar_blocks += 1
+        self.t_ar += time.time() - t_start
+        samps = np.concatenate(accepted)[:n_want]
+        if n is None:
+            return samps[0]
+        return samps
 
-    def samp_ar(self):
+    def importance(self, n, priors=None, llfuncs=None, proposal='posterior',
+                   rng=None, method='random', smooth=True):
         """
-        Return a single sample from the posterior using the accept/reject
-        method.
+        Draw samples from this posterior (or its normal approximation) and
+        compute importance weights for one or more alternative posteriors,
+        with different priors and/or likelihoods; expectations under the
+        alternatives then come without building new grid posteriors.
+
+        Parameters
+        ----------
+        n : int
+            Number of samples
+
+        priors : prior, or list of priors
+            Alternative prior(s), each a constant or a function that can
+            evaluate the PDF on an array; if None, the current prior is used
+
+        llfuncs : function, or list of functions
+            Alternative log-likelihood function(s); if None, the current
+            likelihood is used.  If both `priors` and `llfuncs` are lists,
+            they must have the same length, and are paired.
+
+        proposal : 'posterior' or 'normal'
+            Draw the samples from the grid posterior (by `samp_cdf`; the
+            weights use the posterior PDF as the proposal density, which
+            neglects the interpolation of the grid CDF), or from the normal
+            approx'n of `norm_approx_pdf`
+
+        rng : random number generator or int
+            Generator or seed (see `get_rng`)
+
+        method : str
+            Uniform sampling method for `samp_cdf` (see `uniforms`)
+
+        smooth : bool
+            If True, Pareto-smooth the weights (see `psis`)
+
+        Returns
+        -------
+        ImportanceSample instance
+            The samples, with a row of weights for each alternative
         """
-        while True:
-            self.n_ar += 1
-            param = self.param_grid[0] + rand()*self.span
-            y = rand()*self.mode_pdf
-            if y < self.pdf(param):
-                return param
+        rng = get_rng(rng)
+        if proposal == 'posterior':
+            samps = self.samp_cdf(n, rng, method=method)
+            log_q = self.log_prior(samps) + self.log_like(samps)
+        elif proposal == 'normal':
+            self.norm_approx_pdf()
+            samps = self.mode + self.sig_lap*rng.standard_normal(n)
+            log_q = -0.5*((samps - self.mode)/self.sig_lap)**2
+        else:
+            raise ValueError('Invalid proposal option!')
+
+        # Log prior and likelihood for each alternative:
+        if priors is None:
+            log_priors = [self.log_prior(samps)]
+        elif isinstance(priors, (list, tuple)):
+            log_priors = [self.log_prior(samps, prior) for prior in priors]
+        else:
+            log_priors = [self.log_prior(samps, priors)]
+        if llfuncs is None:
+            log_likes = [self.log_like(samps)]
+        elif isinstance(llfuncs, (list, tuple)):
+            log_likes = [llfunc(samps) for llfunc in llfuncs]
+        else:
+            log_likes = [llfuncs(samps)]
+        if len(log_priors) > 1 and len(log_likes) > 1 and \
+                len(log_priors) != len(log_likes):
+            raise ValueError('Mismatched numbers of priors and llfuncs!')
+        with np.errstate(invalid='ignore'):
+            log_w = array(log_priors) + array(log_likes) - log_q
+        log_w = where(isnan(log_w), -inf, log_w)  # e.g., outside the support
+        return ImportanceSample(samps, log_w, smooth)
+
+    def ar_stats(self):
+        """
+        Return a dict summarizing the accept/reject sampler's work so far:
+        numbers of proposals, accepted samples, and blocks; the acceptance
+        rate; the time spent; and the throughput (accepted samples/sec).
+        """
+        rate = self.n_ar_acc/self.n_ar if self.n_ar else nan
+        speed = self.n_ar_acc/self.t_ar if self.t_ar > 0. else nan
+        return dict(n_prop=self.n_ar, n_acc=self.n_ar_acc,
+                    n_blocks=self.n_ar_blocks, acc_rate=rate,
+                    time=self.t_ar, samps_per_sec=speed)
+
+    def freeze(self):
+        """
+        Return a FrozenPosterior, interpolating the posterior CDF on the
+        grid, for fast vectorized PDF, CDF, and quantile evaluation that
+        never calls the prior or likelihood.
+        """
+        return FrozenPosterior(self.param_grid, self.post_cdf)
 
     def plot(self, ls='b-', lw=3, alpha=1.):
         """
         Plot the posterior PDF in the current axes.
         """
         plot(self.param_grid, self.post_pdf, ls, lw=lw, alpha=alpha)
+
+
+class GridPosteriors(object):
+    """
+    A collection of posterior distributions for a univariate parameter,
+    with all of them normalized and summarized at once via vectorized
+    quadrature.  The posteriors may share a common grid, or each may have
+    its own grid (of common size).
+    """
+
+    def __init__(self, param_grid, log_qvals):
+        """
+        Normalize and summarize the posteriors.
+
+        Parameters
+        ----------
+        param_grid : float array
+            Array of N parameter values, in increasing order, or a (K, N)
+            array giving a separate grid for each posterior
+
+        log_qvals : 2-D float array
+            Log quasiposterior (prior*likelihood) values on the grid, with
+            shape (K, N) for K posteriors
+        """
+        self.param_grid = asarray(param_grid, dtype=float)
+        self.log_qvals = asarray(log_qvals, dtype=float)
+        self.n_post, self.n_grid = self.log_qvals.shape
+        # A (K, N) view of the grid(s), for row-wise indexing:
+        self._grids = np.broadcast_to(self.param_grid, self.log_qvals.shape)
+        self._rows = arange(self.n_post)
+
+        # As for a single posterior, shift each row of log(q) by its max,
+        # and get normalizations, moments, and CDFs in one pass.
+        i_peak = self.log_qvals.argmax(axis=1)
+        self.log_q_max = self.log_qvals[self._rows, i_peak]
+        scaled_q = exp(self.log_qvals - self.log_q_max[:, newaxis])
+        norm, self.post_mean, var, cum = trapz_pass(
+            self.param_grid, scaled_q, self._grids[self._rows, i_peak])
+        self.post_std = sqrt(var)
+        self.log_mlike = self.log_q_max + log(norm)
+        with np.errstate(over='ignore'):
+            self.mlike = exp(self.log_mlike)
+        self.post_pdf = scaled_q/norm[:, newaxis]
+        self.post_cdf = cum/norm[:, newaxis]
+        self.modes = self._find_modes(i_peak)
+
+    def _find_modes(self, i_max):
+        """
+        Return the posterior modes, refined from the grid maxima (at indices
+        `i_max`) by parabolic interpolation of log(q).
+        """
+        rows = self._rows
+        i = clip(i_max, 1, self.n_grid - 2)
+        x0, x1, x2 = [self._grids[rows, i+j] for j in (-1, 0, 1)]
+        y0, y1, y2 = [self.log_qvals[rows, i+j] for j in (-1, 0, 1)]
+        # Vertex of the parabola through the 3 points (which need not be
+        # equally spaced):
+        num = (x1 - x0)**2*(y1 - y2) - (x1 - x2)**2*(y1 - y0)
+        den = (x1 - x0)*(y1 - y2) - (x1 - x2)*(y1 - y0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            modes = clip(x1 - 0.5*num/den, x0, x2)
+        # Keep the grid max for peaks on a boundary, or where the parabola
+        # is degenerate (e.g., for -inf neighbors).
+        keep = (i != i_max) | ~isfinite(modes)
+        return where(keep, self._grids[rows, i_max], modes)
+
+    def quantiles(self, p):
+        """
+        Return the posterior quantiles for probability `p` (a scalar), found
+        by linear interpolation in the CDFs.
+        """
+        rows = self._rows
+        # First grid index with CDF >= p, kept off the lower boundary:
+        i = clip((self.post_cdf < p).sum(axis=1), 1, self.n_grid - 1)
+        cdf_l, cdf_u = self.post_cdf[rows, i-1], self.post_cdf[rows, i]
+        par_l, par_u = self._grids[rows, i-1], self._grids[rows, i]
+        dcdf = cdf_u - cdf_l
+        frac = (p - cdf_l)/where(dcdf > 0., dcdf, 1.)
+        return par_l + frac*(par_u - par_l)
+
+    def credible(self, level=.95):
+        """
+        Return arrays of the lower and upper limits of the central credible
+        intervals of probability `level`.
+        """
+        tail = 0.5*(1. - level)
+        return self.quantiles(tail), self.quantiles(1. - tail)
+
+    def plot(self, ls='b-', lw=1, alpha=.5):
+        """
+        Plot the posterior PDFs in the current axes.
+        """
+        plot(self._grids.T, self.post_pdf.T, ls, lw=lw, alpha=alpha)
+
+
+class FrozenPosterior(object):
+    """
+    A univariate posterior frozen into a monotone (PCHIP) interpolant of its
+    CDF on a grid; the PDF is the derivative of the interpolant, and
+    quantiles come from a monotone interpolant of the inverse CDF.  The PDF
+    is zero outside the grid.
+    """
+
+    def __init__(self, param_grid, cdf):
+        """
+        Build the interpolants.
+
+        Parameters
+        ----------
+        param_grid : float array
+            Array of parameter values, in increasing order
+
+        cdf : float array
+            Posterior CDF values on the grid (from 0 to 1)
+        """
+        self.param_grid = asarray(param_grid, dtype=float)
+        cdf = asarray(cdf, dtype=float)
+        self.lo, self.hi = self.param_grid[0], self.param_grid[-1]
+        # Tail CDF increments can be tiny enough to overflow PCHIP's
+        # harmonic mean of slopes; it handles the resulting infinities.
+        with np.errstate(over='ignore', divide='ignore'):
+            self._cdf = PchipInterpolator(self.param_grid, cdf,
+                                          extrapolate=False)
+        self._pdf = self._cdf.derivative()
+        # The inverse needs CDF values increasing by enough to keep its
+        # slopes finite, so drop points bounding (nearly) flat stretches,
+        # e.g., where the PDF underflows in the tails:  in the lower half
+        # keep points followed by a rise above the floor, in the upper half
+        # points preceded by one.  Kept points then differ by > `floor`.
+        floor = 1e-12
+        rises = diff(cdf) > floor
+        keep = where(cdf < 0.5, append(rises, True), append(True, rises))
+        self._ppf = PchipInterpolator(cdf[keep], self.param_grid[keep])
+        self.cdf_lo, self.cdf_hi = cdf[keep][0], cdf[keep][-1]
+
+    def pdf(self, param_vals):
+        """
+        Return the posterior PDF for the provided param values (scalar or
+        vector).
+        """
+        pdf = self._pdf(param_vals)
+        pdf = where(isnan(pdf), 0., pdf)  # outside the grid
+        return where(pdf > 0., pdf, 0.)[()]  # scalar for a scalar
+
+    def logpdf(self, param_vals):
+        """
+        Return the log of the posterior PDF for the provided param values
+        (scalar or vector).
+        """
+        with np.errstate(divide='ignore'):
+            return log(self.pdf(param_vals))
+
+    def cdf(self, param_vals):
+        """
+        Return the posterior CDF for the provided param values (scalar or
+        vector).
+        """
+        param_vals = asarray(param_vals, dtype=float)
+        cdf = self._cdf(clip(param_vals, self.lo, self.hi))
+        return clip(cdf, 0., 1.)[()]
+
+    def ppf(self, q):
+        """
+        Return the posterior quantiles for the provided probabilities (scalar
+        or vector).
+        """
+        q = clip(asarray(q, dtype=float), self.cdf_lo, self.cdf_hi)
+        return clip(self._ppf(q), self.lo, self.hi)[()]
+
+    def rvs(self, n=None, rng=None):
+        """
+        Return `n` samples from the posterior (a single sample if n=None),
+        by inverting the CDF interpolant; `rng` is a numpy random number
+        generator, or a seed (see `get_rng`).
+        """
+        rng = get_rng(rng)
+        return self.ppf(rng.random(n))
+
+
+class ImportanceSample(object):
+    """
+    A set of samples with importance weights for one or more target
+    dist'ns (one row of weights per target), with the effective sample size
+    and Pareto shape diagnostic for each target, and weighted estimates and
+    sampling-importance-resampling (SIR).
+    """
+
+    def __init__(self, samps, log_w, smooth=True):
+        """
+        Normalize (and optionally Pareto-smooth) the weights.
+
+        Parameters
+        ----------
+        samps : float array
+            The n samples
+
+        log_w : float array
+            Unnormalized log weights, of shape (n,) or (K, n) for K targets
+
+        smooth : bool
+            If True, Pareto-smooth the weights (see `psis`); otherwise the
+            Pareto shape diagnostic `k_hat` is not computed (it is nan)
+        """
+        self.samps = asarray(samps)
+        log_w = np.atleast_2d(asarray(log_w, dtype=float))
+        self.n_targets, self.n = log_w.shape
+        top = log_w.max(axis=1)[:, newaxis]
+        self.log_w_raw = log_w - top - \
+            log(exp(log_w - top).sum(axis=1))[:, newaxis]
+        if smooth:
+            self.log_w, self.k_hat = psis(log_w)
+        else:
+            self.log_w, self.k_hat = self.log_w_raw, nan*ones(self.n_targets)
+        self.weights = exp(self.log_w)
+        # Kish's effective sample size:
+        self.ess = 1./(self.weights**2).sum(axis=1)
+
+    def mean(self, g=None):
+        """
+        Return the weighted estimates of the expectation of g(x) (default:
+        x itself) under each target.
+        """
+        vals = self.samps if g is None else g(self.samps)
+        return dot(self.weights, vals)
+
+    def resample(self, m=None, rng=None):
+        """
+        Return a (K, m) array of samples drawn with replacement from the
+        samples with probabilities given by the weights for each of the K
+        targets (sampling-importance-resampling).  The default `m` is the
+        number of samples.
+        """
+        rng = get_rng(rng)
+        if m is None:
+            m = self.n
+        # Search all of the rows' CDFs at once, with each offset by its row
+        # number.
+        offsets = arange(self.n_targets)[:, newaxis]
+        cdfs = self.weights.cumsum(axis=1)
+        cdfs /= cdfs[:, -1:]
+        u = rng.random((self.n_targets, m)) + offsets
+        indx = searchsorted((cdfs + offsets).ravel(), u.ravel())
+        indx = clip(indx - self.n*offsets.repeat(m, axis=1).ravel(), 0,
+                    self.n - 1)
+        return self.samps[indx].reshape(self.n_targets, m)
@@ -14,6 +14,32 @@ from scipy import stats
 from scipy.stats import multivariate_normal
 
 
+def get_rng(rng=None):
+    """
+    Return a random number generator for a sampler: NumPy's global generator
+    if `rng` is None, a new numpy.random.Generator if `rng` is a seed (an
+    int or a SeedSequence), and `rng` itself otherwise (e.g., a Generator).
+    """
+    if rng is None:
+        return np.random
+    if isinstance(rng, (int, np.integer, np.random.SeedSequence)):
+        return np.random.default_rng(rng)
+    return rng
+
+
+def spawn_rngs(n, seed=None):
+    """
+    Return a list of `n` statistically independent numpy.random.Generator
+    instances, e.g., one per parallel worker, spawned from a SeedSequence
+    so their streams do not overlap.  Passing the same `seed` (an int or
+    a SeedSequence) reproduces the same streams; if it is None, fresh
+    entropy is used.
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return [np.random.default_rng(child) for child in seed.spawn(n)]
+
+
 class BivariateNormal:
     """
     Bivariate normal dist'n, including specification of conditionals and
@@ -71,11 +97,13 @@ class BivariateNormal:
         """
         return self.bvn.pdf(asarray(xy))
 
-    def sample(self, n=1):
+    def sample(self, n=1, rng=None):
         """
-        Return an array of `n` samples from the BVN.
+        Return an array of `n` samples from the BVN, drawn using the
+        numpy.random.Generator `rng` (or a seed for one); if `rng` is None,
+        NumPy's global generator is used.
         """
-        return self.bvn.rvs(n)
+        return self.bvn.rvs(n, random_state=get_rng(rng))
 
     def xy_grid(self, n, fac=5.):
         """
@@ -11,6 +11,32 @@ from scipy import stats
 from matplotlib.pyplot import *
 
 
+def get_rng(rng=None):
+    """
+    Return a random number generator for a sampler: NumPy's global generator
+    if `rng` is None, a new numpy.random.Generator if `rng` is a seed (an
+    int or a SeedSequence), and `rng` itself otherwise (e.g., a Generator).
+    """
+    if rng is None:
+        return np.random
+    if isinstance(rng, (int, np.integer, np.random.SeedSequence)):
+        return np.random.default_rng(rng)
+    return rng
+
+
+def spawn_rngs(n, seed=None):
+    """
+    Return a list of `n` statistically independent numpy.random.Generator
+    instances, e.g., one per parallel worker, spawned from a SeedSequence
+    so their streams do not overlap.  Passing the same `seed` (an int or
+    a SeedSequence) reproduces the same streams; if it is None, fresh
+    entropy is used.
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return [np.random.default_rng(child) for child in seed.spawn(n)]
+
+
 class MargCondJoint2D:
 
     def __init__(self, x_marg, y_cond_x):
@@ -43,19 +69,24 @@ class MargCondJoint2D:
         y_cond = self.y_cond_x(xy[0])
         return self.x_marg.pdf(xy[0]) * y_cond.pdf(xy[1])
 
-    def sample(self, n=1):
+    def sample(self, n=1, rng=None):
         """
         Return `n` samples from the joint distribution as two
         arrays, of x and y coordinates.
+
+        If `rng` (a numpy.random.Generator, or a seed for one) is given, it
+        is passed to the rvs() methods as `random_state`; otherwise they
+        use their default (usually NumPy's global generator).
         """
+        kwds = {'random_state': get_rng(rng)}
         if n==1:
-            xvals = array( [self.x_marg.rvs()] )
+            xvals = array( [self.x_marg.rvs(**kwds)] )
         else:
-            xvals = self.x_marg.rvs(n)
+            xvals = self.x_marg.rvs(n, **kwds)
         yvals = empty_like(xvals)
         for i, x in enumerate(xvals):
             y_cond = self.y_cond_x(x)
-            yvals[i] = y_cond.rvs()
+            yvals[i] = y_cond.rvs(**kwds)
         return xvals, yvals
 
 
@@ -44,6 +44,19 @@ else:
 __all__ = ['StanFitter']
 
 
+def get_rng(rng=None):
+    """
+    Return a random number generator for a sampler: NumPy's global generator
+    if `rng` is None, a new numpy.random.Generator if `rng` is a seed (an
+    int or a SeedSequence), and `rng` itself otherwise (e.g., a Generator).
+    """
+    if rng is None:
+        return np.random
+    if isinstance(rng, (int, np.integer, np.random.SeedSequence)):
+        return np.random.default_rng(rng)
+    return rng
+
+
 # ImmutableAttrDict based on discussion from:
 # http://stackoverflow.com/questions/9997176/immutable-dictionary-only-use-as-a-key-for-another-dictionary
 
@@ -127,9 +140,11 @@ class ParamHandler(dict):
         # a __dict___, so they remain accessible from self.
         self.__dict__ = self
 
-    def subsample(self, n):
+    def subsample(self, n, rng=None):
         """
-        Return a random subsample of size n from the merged, thinned chains.
+        Return a random subsample of size n from the merged, thinned chains,
+        drawn using the numpy.random.Generator `rng` (or a seed for one;
+        NumPy's global generator is used if `rng` is None).
 
         Note that calling this separately for different parameters will not
         produced a set of parameter vectors from the posterior; the parameter
@@ -137,7 +152,7 @@ class ParamHandler(dict):
         """
         if n > len(self.thinned):
             raise ValueError('Requested sample size > thinned chain length!')
-        return random.choice(self.thinned, n, replace=False)
+        return get_rng(rng).choice(self.thinned, n, replace=False)
 
     def trace(self, chain=None, step=True, axes=None,
                     xlabel=None, ylabel=None, **kwds):
@@ -466,14 +481,17 @@ class StanFitResults:
         param.thinned = np.ravel(thinned, order='F')
         self.n_thinned = param.thinned.shape[0]
 
-    def subsample_indices(self, n):
+    def subsample_indices(self, n, rng=None):
         """
         Return a set of indices defining a random subsample of size n from the
-        merged, thinned chains.
+        merged, thinned chains, drawn using the numpy.random.Generator `rng`
+        (or a seed for one; NumPy's global generator is used if `rng` is
+        None).  Using the same indices for all parameters gives a subsample
+        of parameter vectors.
         """
         if n > self.n_thinned:
             raise ValueError('Requested sample size > thinned chain length!')
-        return random.choice(self.n_thinned, n)
+        return get_rng(rng).choice(self.n_thinned, n)
 
     def point(self, i):
         """
@@ -644,7 +662,9 @@ class StanFitter:
 
         `seed` should be an `int` between 0 and MAX_UINT, inclusive, or NumPy's
         `np.random.RandomState`, whose `randint` method will be used to get
-        a seed.  If `seed` is None, a random seed will be used.
+        a seed, or a `np.random.Generator` (e.g., one of a set of independent
+        streams for parallel fits), whose `integers` method will be used.
+        If `seed` is None, a random seed will be used.
 
         Note that since Stan supports hierarchical models, the
         parameter space may not be completely defined until a dataset is
@@ -653,6 +673,8 @@ class StanFitter:
         """
         self.data = data
         # Note: fit_class API changed to require seed after PyStan-2.14.
+        if isinstance(seed, random.Generator):
+            seed = int(seed.integers(np.iinfo(np.int32).max))
         seed = pystan.misc._check_seed(seed)
         self.fit = self.model.fit_class(self.data, seed)
         fitparams2attrs(self.fit, self)